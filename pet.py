@@ -1,62 +1,330 @@
+import pet_startup
 import pygame
-import ctypes
+pet_startup.mark('import pygame')
 import shutil
 import os
+import json
 import threading
-import tkinter as tk
-from tkinter import filedialog
-from PIL import Image
-import pystray
+import queue
 import random
+import math
+import time
 from pet_compile import SimplePetLoader
+from pet_catalog import PetCatalog
+from pet_cache import frame_cache
+from pet_render import DirtyRectRenderer, RENDER_MODES
+from pet_hud import PerfHud
+from pet_spatial import SpatialGrid
+from pet_social import PetSocial
+from pet_loading import PetLoadingPipeline
+from pet_commands import CommandQueue
+from pet_sim import SimulationClock, SessionRecorder
+import pet_platform
+import pet_trace
 
-# Константы Windows API
-WS_EX_LAYERED = 0x00080000
-WS_EX_TOOLWINDOW = 0x00000080
-GWL_EXSTYLE = -20
-HWND_TOPMOST = -1
-SWP_NOSIZE = 0x0001
-SWP_NOMOVE = 0x0002
-LWA_ALPHA = 0x00000002
-LWA_COLORKEY = 0x00000001
+pet_startup.mark('import modules')
+
+# tkinter, PIL и pystray загружаются только для трея и меню, уже после первого кадра
+tk = None
+filedialog = None
+messagebox = None
+
+
+def load_tk():
+    """Импортирует tkinter при первом открытии меню (или заранее в фоне)"""
+    global tk, filedialog, messagebox
+    if tk is None:
+        import tkinter
+        from tkinter import filedialog as tk_filedialog, messagebox as tk_messagebox
+        filedialog, messagebox = tk_filedialog, tk_messagebox
+        tk = tkinter
+        pet_startup.mark('menu toolkit')
+
+# Событие для пробуждения главного цикла из других потоков
+WAKE_EVENT = pygame.USEREVENT + 1
+# Максимальная частота кадров и сколько держать ее после ввода (мс)
+MAX_FPS = 60
+INTERACTION_WINDOW = 500
+# Максимальное время сна главного цикла (мс)
+MAX_IDLE_WAIT = 1000
+# Питомцы и их позиции прошлого запуска
+SESSION_FILE = os.path.join("Cache", "session.json")
+# Как часто обновлять снимок списка питомцев для открытого меню (мс)
+SNAPSHOT_INTERVAL = 100
 
 class PetManager:
-    def __init__(self):
-        ctypes.windll.shcore.SetProcessDpiAwareness(1)
+    def __init__(self, use_swarm=None, tray=True, seed=None, record=None, render_mode=None,
+                 display_scale=None, social=None):
+        self.platform = pet_platform.current_platform
+        self.platform.set_dpi_awareness()
         os.environ['SDL_VIDEO_WINDOW_POS'] = '0,0'
-        user32 = ctypes.windll.user32
-        self.screen_width = user32.GetSystemMetrics(0)
-        self.screen_height = user32.GetSystemMetrics(1)
+        self.screen_width, self.screen_height = self.platform.get_screen_size()
+        # Кадры питомцев загружаются под масштаб экрана (PET_DISPLAY_SCALE - переопределение)
+        if display_scale is None:
+            display_scale = float(os.environ.get('PET_DISPLAY_SCALE') or self.platform.get_display_scale())
+        self.display_scale = display_scale
+        frame_cache.display_scale = self.display_scale
+        # Подготовка кадров: alpha или colorkey под прозрачный белый цвет окна (PET_RENDER_MODE)
+        self.render_mode = render_mode or os.environ.get('PET_RENDER_MODE') or 'alpha'
+        if self.render_mode not in RENDER_MODES:
+            raise ValueError(f"Неизвестный режим отрисовки: {self.render_mode}")
+        frame_cache.render_mode = self.render_mode
+        # Трассировка Chrome trace events с самого запуска (PET_TRACE=1 или путь файла)
+        trace = os.environ.get('PET_TRACE')
+        if trace:
+            pet_trace.start(None if trace == '1' else trace)
+        # Дельта-анимации восстанавливать по мере проигрывания (PET_DELTA_LAZY=1): меньше памяти
+        frame_cache.lazy_delta = os.environ.get('PET_DELTA_LAZY') == '1'
         pygame.init()
         self.screen = pygame.display.set_mode((self.screen_width, self.screen_height), pygame.NOFRAME)
         
-        self.hwnd = pygame.display.get_wm_info()['window']
-        
-        ex_style = ctypes.windll.user32.GetWindowLongA(self.hwnd, GWL_EXSTYLE)
-        ctypes.windll.user32.SetWindowLongA(self.hwnd, GWL_EXSTYLE, 
-                                          ex_style | WS_EX_LAYERED | WS_EX_TOOLWINDOW)
-        
-        ctypes.windll.user32.SetLayeredWindowAttributes(self.hwnd, 0x00FFFFFF, 255, LWA_COLORKEY)
+        self.hwnd = pygame.display.get_wm_info().get('window')
+        self.platform.setup_overlay(self.hwnd)
+        pet_startup.mark('display')
 
         self.click_pos = None
         self.pets = []
+        self.pets_by_z = {}  # pet.z -> питомец, для команд меню
         self.all_pet_ids = []
         self.running = True
         self.show_debug = False
         self.menu_show = False
         self.menu_window = None  # Ссылка на tkinter окно (self.root)
-        self.setup_tray()  
+        self.last_input_time = 0
+        self.pending_events = []
+        self.renderer = DirtyRectRenderer(self.screen)
+        self.hud = PerfHud()
+        self.spatial = SpatialGrid()
+        self.selected_pet = None  # выделен не больше одного питомца
+        self.next_z = 0
+
+        # Симуляция идет фиксированными шагами; случайность питомцев - от seed менеджера
+        self.clock = SimulationClock()
+        if seed is None:
+            seed = int(os.environ.get('PET_SEED') or random.randrange(2 ** 32))
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.loading = PetLoadingPipeline(
+            lambda file_path, frames: DesktopPet(asset_file=file_path, frames=frames),
+            on_ready=self.wake)
+        # Изменения питомцев из меню и трея выполняются в потоке pygame между кадрами
+        self.commands = CommandQueue({
+            'add': self.load_pet,
+            'remove': self.remove_pet_by_key,
+            'clear': self.clear_pets,
+            'toggle_debug': self.toggle_debug,
+            'select': self.select_pet,
+            'prefetched': frame_cache.finish_prefetch
+        }, on_post=self.wake)
+        # Анимации из очереди prefetch декодируются в потоках загрузки
+        frame_cache.prefetcher = self.prefetch_animation
+        # Снимок питомцев для меню: кортеж (ключ, id, файл, x, y), заменяется целиком
+        self.snapshot = ()
+        self.snapshot_time = None
+
+        # Пакетная симуляция на NumPy для большого числа питомцев (PET_SWARM=1)
+        if use_swarm is None:
+            use_swarm = os.environ.get('PET_SWARM') == '1'
+        self.swarm = None
+        if use_swarm:
+            try:
+                from pet_swarm import SwarmSimulation
+            except ImportError as e:
+                # NumPy - необязательная зависимость (requirements-swarm.txt)
+                print(f"Пакетная симуляция недоступна ({e}), питомцы обновляются по одному")
+            else:
+                self.swarm = SwarmSimulation()
+        # Расталкивание и реакции питомцев друг на друга (PET_SOCIAL=1 - включить)
+        if social is None:
+            social = os.environ.get('PET_SOCIAL') == '1'
+        self.social = PetSocial(self.display_scale) if social else None
+        # Запись сессии для воспроизведения (PET_RECORD=файл.jsonl); в заголовке все,
+        # от чего зависит симуляция
+        if record is None:
+            record = os.environ.get('PET_RECORD')
+        self.recorder = None
+        if record:
+            self.recorder = SessionRecorder(record, seed, self.clock.step_ms,
+                                            (self.screen_width, self.screen_height),
+                                            display_scale=self.display_scale,
+                                            social=self.social is not None,
+                                            swarm=self.swarm is not None)
+        # Трей запускается в фоне после первого кадра (см. run)
+        self.tray = tray
+        self.tray_thread = None
 
-    def add_pet(self, pet):
+    def add_pet(self, pet, position=None):
+        """Добавляет питомца; без position он встает в случайное место от seed менеджера"""
+        pet.z = self.next_z
+        self.next_z += 1
+        pet.seed = self.rng.getrandbits(64)
+        pet.rng = random.Random(pet.seed)
+        # Место тянется из rng и при заданной позиции, чтобы она не сдвигала seed следующих питомцев
+        x, y = self.rng.randint(0, pet.screen_width - 100), self.rng.randint(0, pet.screen_height - 100)
+        pet.x_pos, pet.y_pos = position if position is not None else (x, y)
+        pet.last_update = self.clock.time
+        pet.prev_x, pet.prev_y = pet.x_pos, pet.y_pos
+        if self.recorder:
+            self.recorder.record('add', file=pet.asset_file, x=pet.x_pos, y=pet.y_pos, seed=pet.seed)
         self.pets.append(pet)
+        self.pets_by_z[pet.z] = pet
         self.all_pet_ids.append(pet.id)
+        pet_startup.mark('first pet')
+        if self.swarm is not None:
+            self.swarm.add(pet)
+        self.wake()
+
+    def load_pet(self, file_path, on_done=None, position=None):
+        """Загружает питомца в фоне и добавляет его, когда кадры готовы.
+
+        on_done(pet, error) вызывается в потоке pygame.
+        """
+        def finish(pet, error):
+            if pet is not None and pet.id in self.all_pet_ids:
+                pet.release()
+                pet, error = None, ValueError("Питомец уже добавлен")
+            if pet is not None:
+                self.add_pet(pet, position)
+            if on_done:
+                on_done(pet, error)
+
+        return self.loading.submit(file_path, finish)
+
+    def prefetch_animation(self, frame_set, name):
+        """Спрайтшит декодируется в потоке загрузки, кадры создаются командой 'prefetched'"""
+        def finish(sheet, error):
+            if not self.commands.post('prefetched', frame_set, name, sheet, error):
+                # Очередь переполнена: анимация декодируется при первом обращении
+                frame_cache.finish_prefetch(frame_set, name, None, error=ValueError("очередь команд переполнена"))
+
+        self.loading.prefetch(frame_set.source, name, finish)
+
+    def save_session(self, path=SESSION_FILE):
+        """Запоминает активных питомцев и их позиции"""
+        session = {"pets": [{"file": pet.asset_file, "x": pet.x_pos, "y": pet.y_pos} for pet in self.pets]}
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(session, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Ошибка сохранения сессии: {e}")
+
+    def restore_session(self, path=SESSION_FILE):
+        """Загружает в фоне питомцев прошлого запуска на их места"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                session = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        restored = 0
+        for entry in session.get("pets", []):
+            if not os.path.exists(entry["file"]):
+                continue
+            # Позиция могла оказаться за экраном после смены разрешения
+            position = (min(max(0, entry["x"]), self.screen_width - 100),
+                        min(max(0, entry["y"]), self.screen_height - 100))
+            self.load_pet(entry["file"], position=position)
+            restored += 1
+        return restored
+
+    def remove_pet(self, pet):
+        """Удаляет питомца и освобождает его кадры"""
+        if self.recorder:
+            self.recorder.record('remove', index=self.pets.index(pet))
+        if self.swarm is not None:
+            self.swarm.remove(pet)
+        self.pets.remove(pet)
+        self.pets_by_z.pop(pet.z, None)
+        self.spatial.remove(pet)
+        if pet.id in self.all_pet_ids:
+            self.all_pet_ids.remove(pet.id)
+        if pet is self.selected_pet:
+            self.selected_pet = None
+        pet.release()
+        self.wake()
+
+    def clear_pets(self):
+        for pet in list(self.pets):
+            self.remove_pet(pet)
+
+    def find_pet(self, key):
+        """Питомец по ключу из снимка (pet.z) или None"""
+        return self.pets_by_z.get(key)
+
+    def remove_pet_by_key(self, key):
+        pet = self.find_pet(key)
+        if pet is not None:
+            self.remove_pet(pet)
+
+    def select_pet(self, key):
+        """Выделяет питомца по ключу (None - снять выделение)"""
+        self.set_selected(self.find_pet(key) if key is not None else None)
+        self.wake()
+
+    def set_selected(self, pet):
+        """Переключает выделение: меняются только старый и новый питомец"""
+        if pet is self.selected_pet:
+            return
+        if self.selected_pet is not None:
+            self.selected_pet.is_selected = False
+        if pet is not None:
+            pet.is_selected = True
+        self.selected_pet = pet
+
+    def publish_snapshot(self):
+        """Обновляет снимок питомцев для меню (в потоке pygame)"""
+        self.snapshot = tuple((pet.z, pet.id, os.path.basename(pet.asset_file), int(pet.x_pos), int(pet.y_pos))
+                              for pet in self.pets)
+        self.snapshot_time = pygame.time.get_ticks()
+
+    def toggle_debug(self):
+        self.show_debug = not self.show_debug
+        self.wake()
+
+    def wake(self):
+        """Будит главный цикл, если он ждет событий (можно вызывать из любого потока)"""
+        if pygame.display.get_init():
+            pygame.event.post(pygame.event.Event(WAKE_EVENT))
+
+    def get_idle_timeout(self):
+        """Сколько мс главный цикл может спать; 0 - нужна полная частота кадров"""
+        current_time = pygame.time.get_ticks()
+        if self.show_debug or frame_cache.has_pending():
+            return 0
+        # Питомцев еще расталкивает - двигаются без цели
+        if self.social is not None and self.social.pushed:
+            return 0
+        if current_time - self.last_input_time < INTERACTION_WINDOW:
+            return 0
+
+        # Сроки питомцев - во времени симуляции, недоделанный шаг уже накоплен в clock
+        sim_time = self.clock.time
+        deadline = sim_time + MAX_IDLE_WAIT
+        for pet in self.pets:
+            deadline = min(deadline, pet.get_next_deadline())
+        if deadline <= sim_time:
+            return 0
+        return max(0, int(deadline - sim_time - self.clock.accumulator))
         
+    def start_tray(self):
+        """Запускает иконку в трее в фоновом потоке, не задерживая первый кадр"""
+        if self.tray_thread is None:
+            self.tray_thread = threading.Thread(target=self.setup_tray, daemon=True)
+            self.tray_thread.start()
+
     def setup_tray(self):
+        """Создает иконку в трее и обслуживает ее (выполняется в потоке трея)"""
+        from PIL import Image
+        import pystray
 
         def exit_action(icon, item):
             self.running = False
             for pet in self.pets:
                 pet.running = False
+            # Загрузки в очереди больше не нужны
+            self.loading.shutdown()
             
             pygame.quit()
             
@@ -67,23 +335,37 @@ class PetManager:
                 except:
                     pass
             icon.stop()
+            self.save_session()
+            pet_trace.stop()
+            if self.recorder:
+                self.recorder.close()
             os._exit(0)
             
         def debug_action(icon, item):
-            self.show_debug = not self.show_debug
+            self.commands.post('toggle_debug')
 
         def menu_action(icon, item):
             self.show_menu()
 
+        def trace_action(icon, item):
+            pet_trace.toggle()
+
         image = Image.new('RGB', (64, 64), 'red')
         menu = pystray.Menu(
             pystray.MenuItem('Меню', menu_action),
             pystray.MenuItem('Debug', debug_action),
+            pystray.MenuItem('Трассировка', trace_action, checked=lambda item: pet_trace.enabled),
             pystray.MenuItem('Выход', exit_action)
         )
         self.icon = pystray.Icon('pet', image, menu=menu)
-        self.tray_thread = threading.Thread(target=self.icon.run, daemon=True)
-        self.tray_thread.start()
+        pet_startup.mark('tray')
+
+        def ready(icon):
+            icon.visible = True
+            # Меню откроется быстрее, если tkinter уже импортирован
+            load_tk()
+
+        self.icon.run(setup=ready)
 
     def show_menu(self):
         if hasattr(self, 'menu_window') and self.menu_window and self.menu_window.winfo_exists():
@@ -103,15 +385,15 @@ class PetManager:
     def handle_selection(self, mouse_pos):
         clicked_pet = None
         
-        # Проверяем всех питомцев с конца (верхние слои)
-        for pet in reversed(self.pets):
+        # Кандидаты из сетки, проверяем сверху вниз (по порядку отрисовки)
+        candidates = self.spatial.query_point(mouse_pos)
+        for pet in sorted(candidates, key=lambda pet: pet.z, reverse=True):
             if self.is_point_on_pet(mouse_pos, pet):
                 clicked_pet = pet
                 break
         
         # Обновляем состояние выделения
-        for pet in self.pets:
-            pet.is_selected = (pet == clicked_pet)
+        self.set_selected(clicked_pet)
     
     def is_point_on_pet(self, point, pet):
         """Проверяет, находится ли клик на питомце"""
@@ -123,134 +405,287 @@ class PetManager:
         if not frames or pet.current_frame >= len(frames):
             return False
             
-        frame = frames[pet.current_frame]
-        pet_rect = frame.get_rect(topleft=(pet.x_pos, pet.y_pos))
-        
-        return pet_rect.collidepoint(point)
+        pet_rect = pet.get_frame_rect()
+        if not pet_rect.collidepoint(point):
+            return False
+
+        # Попиксельная проверка по маске кадра, прозрачные поля не выделяют питомца
+        local_x = point[0] - pet_rect.x
+        local_y = point[1] - pet_rect.y
+        if not pet.facing_right:
+            local_x = pet_rect.width - 1 - local_x
+        return bool(pet.get_mask().get_at((local_x, local_y)))
 
     def run(self):
 
         clock = pygame.time.Clock()
         while self.running:
-            for event in pygame.event.get():
+            self.tick()
+            if not self.running:
+                self.save_session()
+                self.loading.shutdown()
+                break
+            if self.tray:
+                self.start_tray()
+            clock.tick(MAX_FPS)
+
+            # Если ничего не движется - спим до ближайшего события питомцев или ввода
+            timeout = self.get_idle_timeout()
+            if timeout > 0:
+                event = pygame.event.wait(timeout)
+                if event.type != pygame.NOEVENT:
+                    self.pending_events.append(event)
+
+    @pet_trace.traced('frame', 'loop')
+    def tick(self, steps=None):
+        """Один кадр: события, шаги симуляции, отрисовка (без ожидания).
+
+        steps - число шагов симуляции; по умолчанию по прошедшему реальному времени.
+        """
+        frame_start = time.perf_counter()
+        with pet_trace.span('events', 'loop'):
+            events = self.pending_events + pygame.event.get()
+            self.pending_events = []
+            self.hud.record_events(len(events))
+            for event in events:
                 if event.type == pygame.QUIT:
                     self.running = False
-                    break
-                elif event.type == pygame.MOUSEBUTTONDOWN:
+                    return
+                elif event.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.MOUSEMOTION):
+                    self.last_input_time = pygame.time.get_ticks()
+                if event.type == pygame.MOUSEBUTTONDOWN:
                     if event.button == 1:
                         self.click_pos = event.pos
+                        if self.recorder:
+                            self.recorder.record('click', pos=list(event.pos))
                         self.handle_selection(event.pos)
-                    
-            if not self.running:
-                break
-                
-            # Обновляем всех питомцев
-            for pet in self.pets:
-                pet.update()
-            
-            # Очищаем экран
-            self.screen.fill((255, 255, 255))
+
+        # Команды меню и трея, затем питомцы, загруженные в фоне
+        with pet_trace.span('commands', 'loop'):
+            self.commands.drain()
+            self.loading.drain()
+        if self.menu_show and (self.snapshot_time is None
+                               or pygame.time.get_ticks() - self.snapshot_time >= SNAPSHOT_INTERVAL):
+            self.publish_snapshot()
             
-            # Рисуем всех питомцев
+        # Шаги симуляции за прошедшее время
+        alpha = 1.0
+        if steps is None:
+            steps = self.clock.advance(frame_start)
+            alpha = self.clock.alpha
+        phase_start = time.perf_counter()
+        self.simulate(steps)
+        render_start = time.perf_counter()
+        self.hud.record_phase('update', render_start - phase_start)
+        if self.recorder:
+            self.recorder.end_frame(steps)
+        
+        self.render_frame(alpha)
+        pet_startup.mark('first frame')
+        frame_end = time.perf_counter()
+        self.hud.record_phase('draw', frame_end - render_start - self.renderer.present_time)
+        self.hud.record_phase('present', self.renderer.present_time)
+        self.hud.record_frame(frame_start, frame_end)
+
+        # Догружаем анимации из очереди и выгружаем холодные
+        with pet_trace.span('cache_maintain', 'load'):
+            frame_cache.maintain()
+
+    @pet_trace.traced('simulate', 'update')
+    def simulate(self, steps):
+        """Продвигает симуляцию на steps фиксированных шагов"""
+        for _ in range(steps):
+            self.clock.steps += 1
+            self.update_pets(self.clock.time)
+            if self.social is not None:
+                self.social.step(self.pets, self.clock.time, self.swarm)
+
+    @pet_trace.traced('render', 'draw')
+    def render_frame(self, alpha=1.0):
+        """Рисует питомцев между двумя последними шагами (alpha - доля шага)
+        и debug информацию, выводит только измененные области"""
+        if self.show_debug and self.hud.should_refresh():
+            self.hud.set_lines(self.get_debug_lines())
+        self.renderer.render(self.get_drawables(alpha))
+
+    def update_pets(self, current_time):
+        """Шаг всех питомцев: пакетно через swarm или по одному"""
+        if self.swarm is not None:
+            self.swarm.step(current_time)
+        elif self.show_debug:
+            self.update_pets_timed(current_time)
+        else:
             for pet in self.pets:
-                pet.draw(self.screen)
-            
-            # Рисуем debug информацию
-            self.draw_debug_info(screen=self.screen, click_pos=self.click_pos)
-            
-            # Обновляем дисплей
-            pygame.display.flip()
-            clock.tick(60)
+                pet.update(current_time)
 
-    def draw_debug_info(self, screen, click_pos):
+    def update_pets_timed(self, current_time):
+        """Обновление питомцев с замером времени каждого (для debug панели)"""
+        for pet in self.pets:
+            start = time.perf_counter()
+            pet.update(current_time)
+            self.hud.record_pet(pet, update=time.perf_counter() - start)
+
+    def get_drawables(self, alpha=1.0):
+        """Элементы кадра для DirtyRectRenderer: (ключ, rect, состояние, отрисовка)"""
+        items = []
+        if self.swarm is not None:
+            self.swarm.interpolate(alpha)
+        else:
+            for pet in self.pets:
+                pet.interpolate(alpha)
+        for pet in self.pets:
+            rect = pet.get_rect()
+            # Сетка для выбора кликом обновляется по отрисованному положению
+            self.spatial.update(pet, rect)
+            draw = self.hud.timed_draw(pet) if self.show_debug else pet.draw
+            items.append((pet, rect, pet.get_draw_state(), draw))
         if not self.show_debug:
-            return 
+            return items
 
-        debug_width, debug_height = 280, 200
-        debug_surface = pygame.Surface((debug_width, debug_height), pygame.SRCALPHA)
-        debug_surface.fill((0, 0, 0, 200))
-        
-        for event in pygame.event.get():
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if event.button == 1:
-                    click_pos = event.pos
-
-        font = pygame.font.SysFont('Arial', 22)
-        lines = [
-            f"Is running: {self.running}",
-            f"Pet count: {len(self.pets)}",
-            f"Show debug: {self.show_debug}",
-            f"Clicked: {click_pos}",
-            f"Menu open: {self.menu_show}",
-            f"Frame: {pygame.time.get_ticks()}",
-            "=== Debug Mode ==="
+        items.append(("debug", self.get_debug_rect(), self.hud.version,
+                      lambda screen: self.draw_debug_info(screen=screen, click_pos=self.click_pos)))
+        return items
+
+    def get_debug_rect(self):
+        debug_width, debug_height = self.hud.get_size()
+        return pygame.Rect(self.screen_width - debug_width - 10, self.screen_height - debug_height - 10,
+                           debug_width, debug_height)
+
+    def get_debug_lines(self):
+        """Строки debug панели производительности"""
+        hud = self.hud
+        cache_stats = frame_cache.stats()
+        frame_ms = [hud.percentile(hud.frame_times, q) * 1000 for q in (0.5, 0.95, 0.99)]
+        phase_ms = [hud.mean(hud.phase_times[name]) * 1000 for name in ('update', 'draw', 'present')]
+
+        hud.forget_pets(self.pets)
+        pet_times = list(hud.pet_times.items())
+        update_us = hud.mean([update for pet, (update, draw) in pet_times]) * 1e6
+        draw_us = hud.mean([draw for pet, (update, draw) in pet_times]) * 1e6
+        slowest = max(pet_times, key=lambda item: sum(item[1]), default=None)
+        slowest_text = "-"
+        if slowest is not None:
+            slowest_text = f"{os.path.basename(slowest[0].asset_file)} {sum(slowest[1]) * 1e6:.0f} us"
+
+        return [
+            "=== Debug Mode ===",
+            f"Pets: {len(self.pets)}  Menu open: {self.menu_show}  Clicked: {self.click_pos}",
+            "Frame ms p50/p95/p99: {:.2f}/{:.2f}/{:.2f}".format(*frame_ms),
+            f"FPS: {hud.fps():.0f}",
+            "Update/draw/present ms: {:.2f}/{:.2f}/{:.2f}".format(*phase_ms),
+            f"Per pet us: update {update_us:.0f}, draw {draw_us:.0f}",
+            f"Slowest pet: {slowest_text}",
+            f"Redraw: {self.renderer.last_dirty_area // 1000} kpx, "
+            f"full {self.renderer.full_redraws}, partial {self.renderer.partial_redraws}, {self.render_mode}",
+            "Cache: {hits}/{misses} hit/miss, {animations} anim".format(**cache_stats),
+            "Atlas: {atlas_pages} pages, {fill:.0f}% used, {atlas_repacks} repacks".format(
+                fill=cache_stats["atlas_fill"] * 100, **cache_stats),
+            "Frames: {used:.1f}/{budget} MB, {policy}, evicted {evictions}".format(
+                used=cache_stats["bytes"] / (1024 * 1024),
+                budget=cache_stats["budget"] // (1024 * 1024) if cache_stats["budget"] else "-",
+                policy=cache_stats["policy"], evictions=cache_stats["evictions"]),
+            f"Events/frame: {hud.event_depth} (max {hud.max_event_depth})",
+            "Social: pushed {}, greet {greet}, follow {follow}, flee {flee}".format(
+                self.social.pushed, **self.social.counts) if self.social is not None else "Social: off",
+            f"Trace: {pet_trace.event_count()} events" if pet_trace.enabled else "Trace: off",
+            "Startup ms: first frame {}, first pet {}".format(
+                *(f"{ms:.0f}" if ms is not None else "-"
+                  for ms in (pet_startup.elapsed('first frame'), pet_startup.elapsed('first pet'))))
         ]
-        
-        for i, line in enumerate(lines):
-            text_surface = font.render(line, False, (255, 255, 255))
-            debug_surface.blit(text_surface, (10, 10 + i * 20))
-        
-        debug_x = self.screen_width - debug_width - 10
-        debug_y = self.screen_height - debug_height - 10
-        
-        pygame.draw.rect(debug_surface, (255, 255, 255), 
-                        debug_surface.get_rect(), 1)
 
-        screen.blit(debug_surface, (debug_x, debug_y))
+    def draw_debug_info(self, screen, click_pos):
+        if not self.show_debug:
+            return 
+
+        self.hud.draw(screen, self.get_debug_rect())
 
 class DesktopPet:
-    def __init__(self, asset_file):
-        user32 = ctypes.windll.user32
-        self.screen_width = user32.GetSystemMetrics(0)            # Ширина экрана
-        self.screen_height = user32.GetSystemMetrics(1)           # Высота экрана 
+    def __init__(self, asset_file, frames=None):
+        screen_size = pet_platform.current_platform.get_screen_size()
+        self.screen_width, self.screen_height = screen_size       # Размер экрана
         self.running = True                                       # Отображение питомца
         self.facing_right = True                                  # Направление питомца вправо
         self.is_selected = False                                  # Статус выбора питомца
         self.current_frame = 0                                    # Текущий кадр
-        self.last_update = pygame.time.get_ticks()                # 
+        self.last_update = pygame.time.get_ticks()                # Время последней смены кадра
         self.animation_speed = 0.4                                # Скорость анимации
         self.current_animation = 'idle'                           # Текущая анимация
+        self.rng = random                                         # Источник случайных чисел (менеджер заменяет своим)
+        self.seed = None                                          # Seed rng, выданный менеджером
         self.x_pos, self.y_pos = self.get_random_coordinates()    # Устанавливаем случайную стартовую позицию
+        self.prev_x, self.prev_y = self.x_pos, self.y_pos         # Позиция до последнего шага
+        self.draw_x, self.draw_y = self.x_pos, self.y_pos         # Интерполированная позиция отрисовки
         self.wander_target = None                                 # Целевая точка (x, y)
         self.prev_target = None                                   # Предыдущая цель блуждания
         self.wander_speed = 2                                     # Скорость движения
         self.last_wander_time = 0                                 # Время последнего блуждания
-        self.ui = {}
+        self.last_social_time = 0                                 # Время последней реакции на соседей
+        self.interaction = None                                   # Последняя реакция: (вид, ключ соседа)
+        self.wander_interval = 10000                              # Период решения о блуждании (мс)
+        self.display_scale = frame_cache.display_scale            # Масштаб экрана
+        self.selection_y_offset = int(26 * 2 * self.display_scale)  # Смещение круга выделения
+        self.asset_file = asset_file
 
         self.pet_loader = SimplePetLoader()
-        self.id = self.pet_loader.get_pet_info(asset_file)["metadata"]['id']
-        try:
-            self.animations_right, self.animations_left = self.pet_loader.load_all_animations(asset_file)
-        except:
-            self.animations_right, self.animations_left = self.pet_loader.load_all_animations("default.pet")
+        self.id = self.pet_loader.get_pet_id(asset_file)
+        if frames is not None:
+            # Кадры уже подготовлены фоновой загрузкой
+            self.frames = frames
+        else:
+            try:
+                self.frames = frame_cache.acquire_pet(asset_file)
+            except:
+                self.frames = frame_cache.acquire_pet("default.pet")
+        self.animations_right, self.animations_left = self.frames.right, self.frames.left
+        # Бег понадобится при первом блуждании - декодируем заранее в свободное время
+        frame_cache.prefetch(self.frames, ['run'])
         self.load_ui()
 
     def get_random_coordinates(self):
-        return (random.randint(0, self.screen_width - 100), random.randint(0, self.screen_height - 100))
+        return (self.rng.randint(0, self.screen_width - 100), self.rng.randint(0, self.screen_height - 100))
+
+    def get_frame_count(self, name):
+        """Количество кадров анимации (по индексу файла, без декодирования)"""
+        count = self.frames.frame_set.frame_counts.get(name)
+        return count if count else len(self.animations_right[name])
 
     def load_ui(self):
-        self.ui['selection'] = self.pet_loader.load_spritesheet(
+        self.ui_frames = frame_cache.acquire_ui(
+            'selection',
             frame_height=10,
             frame_width=32,
-            scale=2,
+            scale=2 * self.display_scale,
             file_path="Assets/UI/Selection_circle.png"
         )
 
+    def get_selection_frame(self):
+        """Кадр круга выделения; берется из кэша при каждой отрисовке, а не хранится"""
+        return self.ui_frames.right['selection'][0]
+
+    def release(self):
+        """Освобождает общие кадры (вызывается при удалении питомца)"""
+        self.running = False
+        self.frames.release()
+        self.ui_frames.release()
+
     def set_wander_target(self, target_x, target_y):
         self.wander_target = (target_x, target_y)
         self.current_frame = 0
         self.current_animation = 'run'  # меняем анимацию на бег
 
-    def update(self):
+    @pet_trace.traced('DesktopPet.update', 'update')
+    def update(self, current_time=None):
         """Обновляет состояние питомца (вызывается каждый кадр)"""
-        current_time = pygame.time.get_ticks()
+        if current_time is None:
+            current_time = pygame.time.get_ticks()
+        self.prev_x, self.prev_y = self.x_pos, self.y_pos
 
         # Логика перемещения
         if self.wander_target is not None:
             target_x, target_y = self.wander_target
             dx = target_x - self.x_pos
             dy = target_y - self.y_pos
-            distance = (dx**2 + dy**2)**0.5
+            distance = math.sqrt(dx * dx + dy * dy)
             
             if distance < self.wander_speed:
                 self.x_pos = target_x
@@ -264,9 +699,9 @@ class DesktopPet:
                 self.facing_right = dx > 0
 
         # Логика блуждания
-        if current_time - self.last_wander_time >= 10000 and self.current_animation != 'run':
+        if current_time - self.last_wander_time >= self.wander_interval and self.current_animation != 'run':
             self.last_wander_time = current_time
-            if random.random() < 0.60:
+            if self.rng.random() < 0.60:
                 target_x, target_y = self.get_random_coordinates()
                 self.set_wander_target(target_x, target_y)
 
@@ -275,28 +710,82 @@ class DesktopPet:
             self.current_frame = (self.current_frame + 1) % len(self.animations_right[self.current_animation])
             self.last_update = current_time
 
+    def interpolate(self, alpha):
+        """Позиция отрисовки между предыдущим и текущим шагом симуляции"""
+        self.draw_x = self.prev_x + (self.x_pos - self.prev_x) * alpha
+        self.draw_y = self.prev_y + (self.y_pos - self.prev_y) * alpha
+
+    def get_next_deadline(self):
+        """Время симуляции, когда питомец изменится в следующий раз"""
+        if self.wander_target is not None:
+            # В движении - меняется каждый шаг
+            return 0
+        next_frame = self.last_update + int(self.animation_speed * 1000) + 1
+        next_wander = self.last_wander_time + self.wander_interval
+        return min(next_frame, next_wander)
+
+    def get_mask(self):
+        """Маска текущего кадра (кадр вправо)"""
+        return self.frames.frame_set.get_mask(self.current_animation, self.current_frame)
+
+    def get_frames(self):
+        """Кадры текущей анимации в текущем направлении"""
+        if self.facing_right:
+            return self.animations_right[self.current_animation]
+        return self.animations_left[self.current_animation]
+
+    def get_draw_position(self):
+        """Целая позиция отрисовки: общая для blit, области перерисовки и выбора кликом"""
+        return int(self.draw_x), int(self.draw_y)
+
+    def get_frame_rect(self):
+        """Область непрозрачной части текущего кадра (кадры обрезаны компилятором)"""
+        x, y = self.get_draw_position()
+        ox, oy = self.get_frames().offsets[self.current_frame]
+        # Размер отраженного кадра равен исходному, отражать его для этого не нужно
+        frame = self.animations_right[self.current_animation][self.current_frame]
+        return frame.get_rect(topleft=(x + ox, y + oy))
+
+    def get_rect(self):
+        """Область экрана, занимаемая питомцем (вместе с кругом выделения)"""
+        rect = self.get_frame_rect()
+        if self.is_selected:
+            x, y = self.get_draw_position()
+            selection = self.get_selection_frame()
+            rect.union_ip(selection.get_rect(topleft=(x, y + self.selection_y_offset)))
+        return rect
+
+    def get_draw_state(self):
+        """Все, от чего зависит изображение питомца, кроме позиции"""
+        return (self.current_animation, self.current_frame, self.facing_right, self.is_selected)
+
+    @pet_trace.traced('DesktopPet.draw', 'draw')
     def draw(self, screen):
         """Отрисовывает питомца (вызывается каждый кадр)"""
 
-        selection_y_offset = 26 * 2
+        selection_y_offset = self.selection_y_offset
 
-        if self.facing_right:
-            frames = self.animations_right[self.current_animation]
-        else:
-            frames = self.animations_left[self.current_animation]
-        screen.blit(frames[self.current_frame], (self.x_pos, self.y_pos))
+        x, y = self.get_draw_position()
+        frames = self.get_frames()
+        ox, oy = frames.offsets[self.current_frame]
+        screen.blit(frames[self.current_frame], (x + ox, y + oy))
         if self.is_selected:
-            screen.blit(self.ui['selection'][0], (self.x_pos, self.y_pos + selection_y_offset))
+            screen.blit(self.get_selection_frame(), (x, y + selection_y_offset))
 
 class PetMenu:
     def __init__(self, pet_manager):
+        load_tk()
         self.pet_manager = pet_manager
         self.pet_loader = SimplePetLoader()
         self.pet_manager.menu_show = True
+        self.loading_count = 0
+        self.load_results = queue.Queue()  # результаты фоновой загрузки для потока Tk
+        self.listed = []                   # строки списка питомцев: (ключ, текст)
 
         self.mypets_dir = "MyPets"
-        self.mypets_ids = self.get_mypets_ids()
         os.makedirs(self.mypets_dir, exist_ok=True)
+        self.catalog = PetCatalog(self.mypets_dir)
+        self.catalog.refresh()
         
         # Создаем главное окно
         self.root = tk.Tk()
@@ -319,6 +808,7 @@ class PetMenu:
         
         # Обработка закрытия окна
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.after(100, self.poll_loading)
         
         self.root.mainloop()
     
@@ -363,12 +853,21 @@ class PetMenu:
         
         self.pet_count_label = tk.Label(
             info_frame,
-            text=f"Активных питомцев: {len(self.pet_manager.pets)}",
+            text=f"Активных питомцев: {len(self.pet_manager.snapshot)}",
             font=('Arial', 10),
             bg=self.style['bg'],
             fg=self.style['fg']
         )
         self.pet_count_label.pack()
+
+        self.loading_label = tk.Label(
+            info_frame,
+            text="",
+            font=('Arial', 9),
+            bg=self.style['bg'],
+            fg=self.style['accent_bg']
+        )
+        self.loading_label.pack()
         
         # Кнопки управления
         buttons_frame = tk.Frame(self.root, bg=self.style['bg'])
@@ -460,6 +959,7 @@ class PetMenu:
             height=6
         )
         self.pet_listbox.pack(fill='both', expand=True, pady=5)
+        self.pet_listbox.bind('<<ListboxSelect>>', self.on_pet_select)
         
         # Кнопка удаления выбранного питомца
         remove_selected_btn = tk.Button(
@@ -485,50 +985,35 @@ class PetMenu:
             initialdir="."  # Текущая директория
         )
         if file_path:
-            id = self.pet_loader.get_pet_info(file_path)["metadata"]['id']
+            id = self.pet_loader.get_pet_id(file_path)
             try:
-                if id not in self.mypets_ids:
+                if not self.catalog.has_id(id):
                     # Копируем файл в MyPets
                     copied_path = self.copy_to_mypets(file_path)
                     if copied_path:
                         # Загружаем из скопированного файла
-                        new_pet = DesktopPet(asset_file=copied_path)
-                        self.pet_manager.add_pet(new_pet)
-                        self.update_pet_list()
-                        print(f"Успешно загружен питомец из: {file_path} (скопирован в MyPets)")
+                        self.start_loading(copied_path,
+                                           f"Успешно загружен питомец из: {file_path} (скопирован в MyPets)")
                     else:
-                        tk.messagebox.showerror("Ошибка", "Не удалось скопировать файл в MyPets")
+                        messagebox.showerror("Ошибка", "Не удалось скопировать файл в MyPets")
                 else:
-                        tk.messagebox.showerror("Ошибка", "Питомец уже добавлен")
+                        messagebox.showerror("Ошибка", "Питомец уже добавлен")
                     
             except Exception as e:
                 print(f"Ошибка загрузки файла {file_path}: {e}")
-                tk.messagebox.showerror("Ошибка", f"Не удалось загрузить файл: {e}")
+                messagebox.showerror("Ошибка", f"Не удалось загрузить файл: {e}")
     
     def get_available_pets(self):
         """Возвращает список доступных .pet файлов в папке MyPets"""
-        pet_files = []
-        try:
-            for file in os.listdir(self.mypets_dir):
-                if file.lower().endswith('.pet'):
-                    full_path = os.path.join(self.mypets_dir, file)
-                    pet_files.append((file, full_path))
-        except Exception as e:
-            print(f"Ошибка чтения папки MyPets: {e}")
-        
-        return pet_files
+        return self.catalog.pets()
 
     def get_mypets_ids(self):
-        mypets_ids = []
-        for file_path in os.listdir(self.mypets_dir):
-            id = self.pet_loader.get_pet_info(file_path)["metadata"]['id']
-            mypets_ids.append(id)
-        return mypets_ids
+        """Id питомцев из MyPets (по каталогу, без чтения файлов)"""
+        return self.catalog.ids
 
     def clear_all_pets(self):
         """Удаляет всех питомцев"""
-        self.pet_manager.pets.clear()
-        self.update_pet_list()
+        self.pet_manager.commands.post('clear')
 
     def copy_to_mypets(self, source_path):
         """Копирует .pet файл в папку MyPets"""
@@ -539,12 +1024,13 @@ class PetMenu:
             # Если файл уже существует, добавляем номер
             counter = 1
             base_name = filename[:-4]  # убираем .pet
-            while os.path.exists(destination):
+            while self.catalog.has_file(os.path.basename(destination)) or os.path.exists(destination):
                 new_filename = f"{base_name}_{counter}.pet"
                 destination = os.path.join(self.mypets_dir, new_filename)
                 counter += 1
             
             shutil.copy2(source_path, destination)
+            self.catalog.add_file(destination)
             return destination
         except Exception as e:
             print(f"Ошибка копирования файла: {e}")
@@ -552,33 +1038,53 @@ class PetMenu:
     
     def toggle_debug(self):
         """Переключает режим debug"""
-        self.pet_manager.show_debug = not self.pet_manager.show_debug
+        self.pet_manager.commands.post('toggle_debug')
     
     def remove_selected_pet(self):
         """Удаляет выбранного питомца из списка"""
         selection = self.pet_listbox.curselection()
         if selection:
             index = selection[0]
-            if index < len(self.pet_manager.pets):
-                del self.pet_manager.pets[index]
-                self.update_pet_list()
-    
+            if index < len(self.listed):
+                self.pet_manager.commands.post('remove', self.listed[index][0])
+
+    def on_pet_select(self, event):
+        """Выделяет на экране питомца, выбранного в списке"""
+        selection = self.pet_listbox.curselection()
+        if selection and selection[0] < len(self.listed):
+            self.pet_manager.commands.post('select', self.listed[selection[0]][0])
+
     def update_pet_list(self):
-        """Обновляет список питомцев и счетчик"""
-        self.pet_listbox.delete(0, tk.END)
-        
-        for i, pet in enumerate(self.pet_manager.pets):
-            pet_type = os.path.basename(pet.pet_loader.current_file) if hasattr(pet.pet_loader, 'current_file') else "Unknown"
-            self.pet_listbox.insert(tk.END, f"{i+1}. {pet_type} - ({int(pet.x_pos)},{int(pet.y_pos)})")
-        
-        self.pet_count_label.config(text=f"Активных питомцев: {len(self.pet_manager.pets)}")
+        """Обновляет список питомцев и счетчик по снимку, меняя только изменившиеся строки"""
+        snapshot = self.pet_manager.snapshot
+        keys = {key for key, pet_id, name, x, y in snapshot}
+        # Удаленные питомцы - снизу вверх, чтобы не сдвигать еще не проверенные строки
+        for index in range(len(self.listed) - 1, -1, -1):
+            if self.listed[index][0] not in keys:
+                self.pet_listbox.delete(index)
+                del self.listed[index]
+
+        selection = self.pet_listbox.curselection()
+        for index, (key, pet_id, name, x, y) in enumerate(snapshot):
+            line = (key, f"{index + 1}. {name} - ({x},{y})")
+            if index >= len(self.listed):
+                self.pet_listbox.insert(tk.END, line[1])
+                self.listed.append(line)
+            elif self.listed[index] != line:
+                self.pet_listbox.delete(index)
+                self.pet_listbox.insert(index, line[1])
+                self.listed[index] = line
+                if index in selection:
+                    self.pet_listbox.selection_set(index)
+
+        self.pet_count_label.config(text=f"Активных питомцев: {len(snapshot)}")
     
     def add_from_mypets(self):
         """Добавляет питомца из папки MyPets"""
         available_pets = self.get_available_pets()
         
         if not available_pets:
-            tk.messagebox.showinfo("Информация", "В папке MyPets нет .pet файлов")
+            messagebox.showinfo("Информация", "В папке MyPets нет .pet файлов")
             return
         
         # Создаем меню выбора
@@ -601,16 +1107,47 @@ class PetMenu:
     def load_mypets_pet(self, file_path):
         """Загружает питомца из папки MyPets"""
         try:
-            new_pet = DesktopPet(asset_file=file_path)
-            if self.pet_loader.get_pet_info(file_path)["metadata"]['id'] not in self.pet_manager.all_pet_ids:
-                self.pet_manager.add_pet(new_pet)
-                self.update_pet_list()
-                print(f"Успешно загружен питомец из MyPets: {os.path.basename(file_path)}")
+            pet_id = self.pet_loader.get_pet_id(file_path)
+            if all(pet_id != active_id for key, active_id, name, x, y in self.pet_manager.snapshot):
+                self.start_loading(file_path,
+                                   f"Успешно загружен питомец из MyPets: {os.path.basename(file_path)}")
             else:
-                    tk.messagebox.showerror("Ошибка", "Питомец уже добавлен")
+                    messagebox.showerror("Ошибка", "Питомец уже добавлен")
         except Exception as e:
             print(f"Ошибка загрузки файла {file_path}: {e}")
-            tk.messagebox.showerror("Ошибка", f"Не удалось загрузить файл: {e}")
+            messagebox.showerror("Ошибка", f"Не удалось загрузить файл: {e}")
+
+    def start_loading(self, file_path, message):
+        """Запускает фоновую загрузку; результат придет в poll_loading"""
+        posted = self.pet_manager.commands.post(
+            'add', file_path,
+            lambda pet, error: self.load_results.put((file_path, message, pet, error)))
+        if not posted:
+            messagebox.showerror("Ошибка", "Слишком много команд, попробуйте еще раз")
+            return
+        self.loading_count += 1
+        self.update_loading_label()
+
+    def poll_loading(self):
+        """Забирает результаты фоновой загрузки (в потоке Tk)"""
+        while True:
+            try:
+                file_path, message, pet, error = self.load_results.get_nowait()
+            except queue.Empty:
+                break
+            self.loading_count -= 1
+            if error is None:
+                print(message)
+            else:
+                print(f"Ошибка загрузки файла {file_path}: {error}")
+                messagebox.showerror("Ошибка", f"Не удалось загрузить файл: {error}")
+        self.update_pet_list()
+        self.update_loading_label()
+        self.root.after(100, self.poll_loading)
+
+    def update_loading_label(self):
+        text = f"Загрузка: {self.loading_count}..." if self.loading_count else ""
+        self.loading_label.config(text=text)
 
     def on_close(self):
         """Обрабатывает закрытие окна"""
@@ -619,4 +1156,6 @@ class PetMenu:
     
 if __name__ == "__main__":
     game = PetManager()
+    if os.environ.get('PET_RESTORE') != '0':
+        game.restore_session()
     game.run()
\ No newline at end of file
@@ -0,0 +1,167 @@
+import pygame
+
+
+class AtlasRegion:
+    """Место кадра в атласе и кадры анимации, которые на него ссылаются"""
+
+    __slots__ = ('page', 'rect', 'surface', 'frames', 'indices')
+
+    def __init__(self, frames):
+        self.page = None
+        self.rect = None
+        self.surface = None
+        self.frames = frames
+        self.indices = []  # позиции кадра в frames (одинаковые кадры - один регион)
+
+
+class AtlasPage:
+    """Страница атласа: большая поверхность с полочной упаковкой"""
+
+    def __init__(self, width, height):
+        self.surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        if pygame.display.get_surface() is not None:
+            self.surface = self.surface.convert_alpha()
+        self.width = width
+        self.height = height
+        self.shelves = []  # [y, высота, занятая ширина]
+        self.free = []     # освобожденные прямоугольники
+        self.regions = set()
+        self.used_area = 0
+
+    @property
+    def packed_height(self):
+        return self.shelves[-1][0] + self.shelves[-1][1] if self.shelves else 0
+
+    @property
+    def fill(self):
+        """Доля занятой полками площади, которая принадлежит живым кадрам"""
+        packed = self.packed_height * self.width
+        return self.used_area / packed if packed else 0.0
+
+    def allocate(self, width, height):
+        # Сначала освобожденные места: наименьшее подходящее
+        best = None
+        for rect in self.free:
+            if rect.width >= width and rect.height >= height:
+                if best is None or rect.width * rect.height < best.width * best.height:
+                    best = rect
+        if best is not None:
+            self.free.remove(best)
+            return pygame.Rect(best.x, best.y, width, height)
+
+        for shelf in self.shelves:
+            y, shelf_height, used = shelf
+            if height <= shelf_height and used + width <= self.width:
+                shelf[2] += width
+                return pygame.Rect(used, y, width, height)
+
+        top = self.packed_height
+        if top + height <= self.height and width <= self.width:
+            self.shelves.append([top, height, width])
+            return pygame.Rect(0, top, width, height)
+        return None
+
+
+class TextureAtlas:
+    """Общие страницы-атласы для кадров всех питомцев и UI.
+
+    add() копирует кадры анимации в страницы и заменяет их в списке на
+    подповерхности страниц: отрисовка остается обычным blit, но вместо сотен
+    мелких поверхностей в памяти несколько больших. remove() освобождает места;
+    сильно фрагментированная страница перепаковывается - ее кадры переносятся
+    в другие страницы, списки кадров обновляются на месте и вызывается on_moved.
+    """
+
+    def __init__(self, page_size=1024, repack_ratio=0.5):
+        self.page_size = page_size
+        self.repack_ratio = repack_ratio
+        self.pages = []
+        self.repacks = 0
+        self._entries = {}  # id(frames) -> (frames, регионы, on_moved)
+
+    def __contains__(self, frames):
+        return id(frames) in self._entries
+
+    def add(self, frames, on_moved=None):
+        """Переносит кадры в атлас (список frames изменяется на месте)"""
+        if id(frames) in self._entries:
+            return frames
+        regions = {}
+        for index, frame in enumerate(frames):
+            region = regions.get(id(frame))
+            if region is None:
+                region = regions[id(frame)] = AtlasRegion(frames)
+                self._place(region, frame)
+            region.indices.append(index)
+            frames[index] = region.surface
+        self._entries[id(frames)] = (frames, list(regions.values()), on_moved)
+        return frames
+
+    def remove(self, frames):
+        """Освобождает места кадров; фрагментированные страницы перепаковываются"""
+        entry = self._entries.pop(id(frames), None)
+        if entry is None:
+            return
+        touched = set()
+        for region in entry[1]:
+            page = region.page
+            page.regions.discard(region)
+            page.free.append(region.rect)
+            page.used_area -= region.rect.width * region.rect.height
+            touched.add(page)
+        for page in touched:
+            if not page.regions:
+                self.pages.remove(page)
+            elif page.fill < self.repack_ratio:
+                self._repack(page)
+
+    def _place(self, region, source):
+        width, height = source.get_size()
+        rect = None
+        for page in self.pages:
+            rect = page.allocate(width, height)
+            if rect is not None:
+                break
+        if rect is None:
+            # Кадр больше страницы получает отдельную страницу своего размера
+            page = AtlasPage(max(self.page_size, width), max(self.page_size, height))
+            self.pages.append(page)
+            rect = page.allocate(width, height)
+
+        # Точное копирование пикселей вместе с альфой: место очищено, ADD = копия
+        page.surface.fill((0, 0, 0, 0), rect)
+        page.surface.blit(source, rect, special_flags=pygame.BLEND_RGBA_ADD)
+        region.page = page
+        region.rect = rect
+        region.surface = page.surface.subsurface(rect)
+        page.regions.add(region)
+        page.used_area += width * height
+
+    def _repack(self, page):
+        """Переносит живые кадры страницы в остальные страницы"""
+        self.pages.remove(page)
+        moved = {}
+        for region in sorted(page.regions, key=lambda region: -region.rect.height):
+            self._place(region, region.surface)
+            for index in region.indices:
+                region.frames[index] = region.surface
+            moved[id(region.frames)] = region.frames
+        page.regions.clear()
+        self.repacks += 1
+        for frames_id in moved:
+            on_moved = self._entries[frames_id][2]
+            if on_moved is not None:
+                on_moved(moved[frames_id])
+
+    @property
+    def nbytes(self):
+        return sum(page.surface.get_pitch() * page.height for page in self.pages)
+
+    def stats(self):
+        used = sum(page.used_area for page in self.pages)
+        total = sum(page.width * page.height for page in self.pages)
+        return {
+            "pages": len(self.pages),
+            "fill": used / total if total else 0.0,
+            "repacks": self.repacks
+        }
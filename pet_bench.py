@@ -0,0 +1,396 @@
+"""Бенчмарки без окна: SDL dummy драйвер и заглушка WinAPI.
+
+    python pet_bench.py --output bench.json
+    python pet_bench.py --output new.json --compare bench.json
+    python pet_bench.py --check-swarm
+"""
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import json
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import pygame
+import pet_platform
+
+pet_platform.set_platform(pet_platform.HeadlessPlatform(1920, 1080))
+
+from pet_compile import SimplePetCompiler, SimplePetLoader, read_pet_info
+from pet_cache import frame_cache
+from pet_diskcache import DiskFrameCache
+from pet import PetManager, DesktopPet
+from pet_social import PetSocial
+from pet_sim import STEP_MS
+
+
+def make_synthetic_pet(directory):
+    """Создает тестового питомца (idle 4 кадра, run 6 кадров) в форматах v1 и v2"""
+    from PIL import Image, ImageDraw
+
+    compiler = SimplePetCompiler()
+    compiler.set_metadata("benchmark")
+    for name, count in (('idle', 4), ('run', 6)):
+        sheet = Image.new('RGBA', (32 * count, 32), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(sheet)
+        for i in range(count):
+            draw.ellipse([32 * i + 4, 6 + i % 2, 32 * i + 28, 30], fill=(220, 120 + 20 * i, 40, 255))
+        path = os.path.join(directory, f"{name}.png")
+        sheet.save(path)
+        compiler.add_animation(name, path, 32, 32, 2)
+
+    v2_path = os.path.join(directory, "bench.pet")
+    v1_path = os.path.join(directory, "bench_v1.pet")
+    compiler.compile(v2_path)
+    compiler.compile(v1_path, binary=False)
+    return v2_path, v1_path
+
+
+def make_long_pet(directory, count=48, size=64):
+    """Длинная анимация, где между кадрами меняется немного пикселей: обычный лист и дельта-кодек"""
+    from PIL import Image, ImageDraw
+
+    sheet = Image.new('RGBA', (size * count, size), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(sheet)
+    for i in range(count):
+        x = size * i
+        draw.ellipse([x + 8, 16, x + 56, 60], fill=(200, 120, 40, 255))
+        draw.ellipse([x + 20 + i // 12, 4, x + 44 + i // 12, 28], fill=(210, 130, 50, 255))
+        if i % 13 not in (5, 6):
+            draw.rectangle([x + 26, 12, x + 29, 15], fill=(0, 0, 0, 255))
+        draw.line([x + 52, 40, x + 62, 20 + i % 24], fill=(150, 80, 20, 200), width=2)
+    image_path = os.path.join(directory, "long.png")
+    sheet.save(image_path)
+
+    paths = {}
+    for codec in ('sheet', 'delta'):
+        compiler = SimplePetCompiler()
+        compiler.set_metadata("benchmark long")
+        compiler.add_animation('idle', image_path, size, size, 2, codec=codec)
+        paths[codec] = os.path.join(directory, f"long_{codec}.pet")
+        compiler.compile(paths[codec])
+    return paths
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def summarize(samples, prefix, scale=1000.0, unit='ms'):
+    return {
+        f"{prefix}.mean_{unit}": sum(samples) / len(samples) * scale,
+        f"{prefix}.p50_{unit}": percentile(samples, 0.5) * scale,
+        f"{prefix}.p95_{unit}": percentile(samples, 0.95) * scale,
+        f"{prefix}.p99_{unit}": percentile(samples, 0.99) * scale,
+    }
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def peak_rss_kb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS возвращает байты, Linux - килобайты
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def bench_startup(pet_path, use_swarm):
+    """Время от создания PetManager до первого выведенного кадра"""
+    start = time.perf_counter()
+    manager = PetManager(use_swarm=use_swarm, tray=False, seed=0, record=False)
+    manager.add_pet(DesktopPet(asset_file=pet_path))
+    manager.tick(steps=1)
+    return manager, {"startup.first_frame_ms": (time.perf_counter() - start) * 1000}
+
+
+def bench_load(v2_path, v1_path, repeat):
+    """Разбор и декодирование .pet файлов"""
+    loader = SimplePetLoader()
+    results = {}
+    for label, path in (('v1', v1_path), ('v2', v2_path)):
+        results.update(summarize(timed(lambda: read_pet_info(path), repeat), f"load.parse_{label}"))
+        results.update(summarize(timed(lambda: loader.load_all_animations(path, mirror=False), repeat),
+                                 f"load.decode_{label}"))
+    return results
+
+
+def bench_codec(paths, repeat):
+    """Длинная анимация: обычный лист против дельта-кодека (сразу и по мере проигрывания)"""
+    loader = SimplePetLoader()
+    results = {}
+    for label, path, lazy in (('sheet', paths['sheet'], False), ('delta', paths['delta'], False),
+                              ('delta_lazy', paths['delta'], True)):
+        results.update(summarize(timed(lambda: list(loader.load_animation(path, 'idle', lazy=lazy)), repeat),
+                                 f"load.long_{label}"))
+    for codec, path in paths.items():
+        results[f"size.long_{codec}_kb"] = os.path.getsize(path) / 1024
+    return results
+
+
+def bench_disk_cache(pet_path, directory, repeat):
+    """Холодная загрузка анимаций (декодирование) против теплой (кэш кадров на диске)"""
+    loader = SimplePetLoader()
+    disk = DiskFrameCache(directory)
+    content_key = frame_cache.content_key(pet_path)
+    names = list(read_pet_info(pet_path)["animations"])
+    for name in names:
+        disk.store(content_key, 1.0, name, loader.load_animation(pet_path, name))
+    disk.flush()
+    cold = timed(lambda: [loader.load_animation(pet_path, name) for name in names], repeat)
+    warm = timed(lambda: [disk.load(content_key, 1.0, name) for name in names], repeat)
+    return dict(summarize(cold, "load.cold_frames"), **summarize(warm, "load.warm_frames"))
+
+
+def keep_moving(manager):
+    """Держит всех питомцев в движении, чтобы нагрузка была стабильной"""
+    for pet in manager.pets:
+        if pet.wander_target is None:
+            pet.set_wander_target(*pet.get_random_coordinates())
+
+
+def populate(manager, pet_path, count):
+    manager.clear_pets()
+    manager.rng.seed(count)
+    for _ in range(count):
+        manager.add_pet(DesktopPet(asset_file=pet_path))
+
+
+def bench_frames(manager, pet_path, count, frames, warmup=30):
+    """Установившееся время кадра для count питомцев"""
+    populate(manager, pet_path, count)
+    for _ in range(warmup):
+        keep_moving(manager)
+        manager.tick(steps=1)
+
+    samples = []
+    for _ in range(frames):
+        keep_moving(manager)
+        start = time.perf_counter()
+        manager.tick(steps=1)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples, f"frames.{count}")
+
+
+def bench_render(manager, pet_path, mode, count, frames, warmup=10):
+    """Полная перерисовка count питомцев в режиме подготовки кадров mode"""
+    manager.clear_pets()
+    frame_cache.render_mode = manager.render_mode = mode
+    populate(manager, pet_path, count)
+    # Все кадры декодированы до замера
+    for pet in manager.pets[:1]:
+        for name in pet.frames.frame_set.names:
+            pet.animations_right[name]
+    for _ in range(warmup):
+        keep_moving(manager)
+        manager.simulate(1)
+        manager.renderer.invalidate()
+        manager.render_frame()
+
+    samples = []
+    for _ in range(frames):
+        keep_moving(manager)
+        manager.simulate(1)
+        manager.renderer.invalidate()
+        start = time.perf_counter()
+        manager.render_frame()
+        samples.append(time.perf_counter() - start)
+    manager.clear_pets()
+    frame_cache.render_mode = manager.render_mode = 'alpha'
+    return summarize(samples, f"render.{mode}.{count}")
+
+
+def bench_social(manager, pet_path, count, steps, area_per_pet=96 * 96):
+    """Шаг симуляции с расталкиванием и реакциями при постоянной плотности питомцев.
+
+    Мир растет вместе с числом питомцев: при равномерном хеше время на питомца
+    не должно зависеть от их общего количества. Время шага сравнивается с
+    фиксированным шагом симуляции STEP_MS.
+    """
+    manager.clear_pets()
+    side = int((count * area_per_pet) ** 0.5) + 100
+    rng = random.Random(count)
+    manager.rng.seed(count)
+    for _ in range(count):
+        pet = DesktopPet(asset_file=pet_path)
+        pet.screen_width = pet.screen_height = side
+        manager.add_pet(pet, (rng.uniform(0, side - 100), rng.uniform(0, side - 100)))
+    social, manager.social = manager.social, PetSocial()
+    samples = timed(lambda: manager.simulate(1), steps)
+    manager.social = social
+    manager.clear_pets()
+    result = summarize(samples, f"social.{count}")
+    result[f"social.{count}.per_pet_us"] = sum(samples) / len(samples) / count * 1e6
+    result[f"social.{count}.step_budget_pct"] = percentile(samples, 0.5) * 1000 / STEP_MS * 100
+    return result
+
+
+def bench_hit_test(manager, count, clicks):
+    """Задержка выбора питомца кликом (половина кликов попадает в питомца)"""
+    rng = random.Random(count)
+    points = []
+    for i in range(clicks):
+        if i % 2 and manager.pets:
+            rect = rng.choice(manager.pets).get_rect()
+            points.append((rng.randrange(rect.left, rect.right), rng.randrange(rect.top, rect.bottom)))
+        else:
+            points.append((rng.randrange(manager.screen_width), rng.randrange(manager.screen_height)))
+    samples = timed(lambda: manager.handle_selection(points.pop()), clicks)
+    return summarize(samples, f"hit_test.{count}", scale=1e6, unit='us')
+
+
+def simulation_state(manager):
+    return [(pet.x_pos, pet.y_pos, pet.current_animation, pet.current_frame, pet.facing_right,
+             pet.wander_target) for pet in manager.pets]
+
+
+def check_swarm(pet_path, count=200, steps=3000):
+    """Сравнивает NumPy swarm со скалярным DesktopPet.update.
+
+    Оба менеджера получают один seed и одни стартовые позиции, на середине
+    часть питомцев удаляется. Возвращает число расхождений состояния питомцев
+    или None, если swarm недоступен.
+    """
+    states = []
+    for use_swarm in (False, True):
+        manager = PetManager(use_swarm=use_swarm, tray=False, seed=count, record=False)
+        if use_swarm and manager.swarm is None:
+            return None
+        populate(manager, pet_path, count)
+        manager.simulate(steps // 2)
+        for pet in manager.pets[::7]:
+            manager.remove_pet(pet)
+        manager.simulate(steps - steps // 2)
+        states.append(simulation_state(manager))
+        manager.clear_pets()
+    scalar, swarm = states
+    if len(scalar) != len(swarm):
+        return max(len(scalar), len(swarm))
+    return sum(1 for a, b in zip(scalar, swarm) if a != b)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(metrics, baseline_path, threshold=0.10):
+    """Печатает изменения относительно прошлого запуска"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)["metrics"]
+    print(f"\n{'metric':40} {'old':>10} {'new':>10} {'change':>8}")
+    for name, value in metrics.items():
+        old = baseline.get(name)
+        if not old or value is None:
+            continue
+        # Все метрики - время или память: рост означает ухудшение
+        change = value / old - 1
+        flag = "  REGRESSION" if change > threshold else ""
+        print(f"{name:40} {old:10.3f} {value:10.3f} {change:+7.1%}{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарки загрузки, симуляции и отрисовки питомцев")
+    parser.add_argument("--pet", help="Файл .pet (по умолчанию генерируется тестовый)")
+    parser.add_argument("--counts", default="1,10,100,1000", help="Количество питомцев через запятую")
+    parser.add_argument("--frames", type=int, default=300, help="Кадров на замер")
+    parser.add_argument("--repeat", type=int, default=20, help="Повторов замеров загрузки")
+    parser.add_argument("--clicks", type=int, default=1000, help="Кликов на замер выбора")
+    parser.add_argument("--swarm", action="store_true", help="Пакетная симуляция на NumPy")
+    parser.add_argument("--check-swarm", action="store_true",
+                        help="Только проверить, что swarm совпадает со скалярной симуляцией")
+    parser.add_argument("--social-counts", default="100,1000,2000,4000",
+                        help="Количество питомцев для замера расталкивания и реакций")
+    parser.add_argument("--render-modes", default="alpha,colorkey",
+                        help="Режимы подготовки кадров для замера полной перерисовки")
+    parser.add_argument("--output", help="JSON файл с результатами")
+    parser.add_argument("--compare", help="JSON файл прошлого запуска для сравнения")
+    args = parser.parse_args(argv)
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.compare) if args.compare else None
+    pet_file = os.path.abspath(args.pet) if args.pet else None
+    # Пути к ассетам UI относительные, как при обычном запуске
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    with tempfile.TemporaryDirectory() as directory:
+        v2_path, v1_path = make_synthetic_pet(directory)
+        pet_path = pet_file or v2_path
+        # Кэш кадров на диске - во временной папке, чтобы не зависеть от прошлых запусков
+        frame_cache.disk = DiskFrameCache(os.path.join(directory, "frames"))
+
+        if args.check_swarm:
+            mismatched = check_swarm(pet_path)
+            if mismatched is None:
+                print("swarm vs scalar: swarm недоступен (нет NumPy)")
+                sys.exit(1)
+            print(f"swarm vs scalar: {'OK' if not mismatched else f'{mismatched} pets differ'}")
+            sys.exit(1 if mismatched else 0)
+
+        metrics = {}
+        manager, startup = bench_startup(pet_path, args.swarm)
+        metrics.update(startup)
+        metrics.update(bench_load(v2_path, v1_path, args.repeat))
+        metrics.update(bench_codec(make_long_pet(directory), args.repeat))
+        print(f"long animation: sheet {metrics['size.long_sheet_kb']:.1f} KB "
+              f"{metrics['load.long_sheet.p50_ms']:.2f} ms, delta {metrics['size.long_delta_kb']:.1f} KB "
+              f"{metrics['load.long_delta.p50_ms']:.2f} ms, lazy {metrics['load.long_delta_lazy.p50_ms']:.2f} ms")
+        metrics.update(bench_disk_cache(pet_path, os.path.join(directory, "bench_frames"), args.repeat))
+        for count in [int(value) for value in args.counts.split(',') if value]:
+            metrics.update(bench_frames(manager, pet_path, count, args.frames))
+            metrics.update(bench_hit_test(manager, count, args.clicks))
+            print(f"{count} pets: frame p50 {metrics[f'frames.{count}.p50_ms']:.2f} ms, "
+                  f"hit test p50 {metrics[f'hit_test.{count}.p50_us']:.1f} us")
+        for count in [int(value) for value in args.counts.split(',') if value]:
+            for mode in [value for value in args.render_modes.split(',') if value]:
+                metrics.update(bench_render(manager, pet_path, mode, count, args.frames))
+                print(f"{count} pets, {mode}: full redraw p50 {metrics[f'render.{mode}.{count}.p50_ms']:.2f} ms")
+        for count in [int(value) for value in args.social_counts.split(',') if value]:
+            metrics.update(bench_social(manager, pet_path, count, args.repeat))
+            print(f"{count} pets: step with social p50 {metrics[f'social.{count}.p50_ms']:.2f} ms "
+                  f"of {STEP_MS:.1f} ms ({metrics[f'social.{count}.step_budget_pct']:.0f}%), "
+                  f"{metrics[f'social.{count}.per_pet_us']:.2f} us per pet")
+        metrics["memory.frame_cache_kb"] = frame_cache.nbytes // 1024
+        manager.clear_pets()
+        metrics["memory.peak_rss_kb"] = peak_rss_kb()
+
+    result = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "pygame": pygame.version.ver,
+            "platform": sys.platform,
+            "video_driver": os.environ.get('SDL_VIDEODRIVER'),
+            "swarm": manager.swarm is not None,
+            "args": vars(args)
+        },
+        "metrics": metrics
+    }
+    print(json.dumps(metrics, indent=2))
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    if baseline:
+        compare(metrics, baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,452 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+import pygame
+from pet_compile import SimplePetLoader, DeltaFrames, read_pet_info
+from pet_atlas import TextureAtlas
+from pet_diskcache import DiskFrameCache
+from pet_render import prepare_colorkey_frames
+
+
+def surface_nbytes(surface):
+    """Примерный объем памяти пикселей поверхности"""
+    if surface.get_parent() is not None:
+        # Область атласа: считаем только ее пиксели, а не всю страницу
+        return surface.get_width() * surface.get_height() * surface.get_bytesize()
+    return surface.get_pitch() * surface.get_height()
+
+
+def unique_surfaces(frames):
+    """Кадры без повторов (одинаковые кадры - один объект Surface)"""
+    return list({id(frame): frame for frame in frames}.values())
+
+
+class MirroredFrames:
+    """Отраженные кадры одной анимации, создаются при первом обращении"""
+
+    def __init__(self, frame_set, name, frames):
+        self._frame_set = frame_set
+        self._name = name
+        self._frames = frames
+        self._mirrored = {}  # кадр вправо -> отраженный кадр
+        self.nbytes = 0
+        self.offsets = frames.mirrored_offsets()
+        self.frame_size = frames.frame_size
+
+    def __len__(self):
+        return len(self._frames)
+
+    def __getitem__(self, index):
+        source = self._frames[index]
+        if isinstance(self._frames, DeltaFrames):
+            # Буфер меняется от кадра к кадру - отражаем каждый раз
+            return pygame.transform.flip(source, True, False)
+        frame = self._mirrored.get(source)
+        if frame is None:
+            frame = pygame.transform.flip(source, True, False)
+            if source.get_colorkey() is not None:
+                frame.set_colorkey(source.get_colorkey(), pygame.RLEACCEL)
+            # Без запаса в бюджете кадр отражается заново при каждой отрисовке
+            if self._frame_set.can_store(self._name, frame):
+                self._mirrored[source] = frame
+                self.nbytes += surface_nbytes(frame)
+        return frame
+
+    def reset(self):
+        """Забывает отраженные кадры (кадры вправо переехали в атласе)"""
+        self._mirrored.clear()
+        nbytes, self.nbytes = self.nbytes, 0
+        return nbytes
+
+
+class LazyAnimations(dict):
+    """Кадры вправо: анимация декодируется при первом обращении"""
+
+    def __init__(self, frame_set):
+        super().__init__()
+        self._frame_set = frame_set
+
+    def __contains__(self, name):
+        return name in self._frame_set.names
+
+    def __missing__(self, name):
+        return self._frame_set.decode(name)
+
+    def __getitem__(self, name):
+        self._frame_set.touch(name)
+        return super().__getitem__(name)
+
+
+class MirroredAnimations(dict):
+    """Ленивые отраженные анимации (влево) поверх кадров вправо"""
+
+    def __init__(self, frame_set):
+        super().__init__()
+        self._frame_set = frame_set
+
+    def __contains__(self, name):
+        return name in self._frame_set.names
+
+    def __missing__(self, name):
+        frames = MirroredFrames(self._frame_set, name, self._frame_set.right[name])
+        self[name] = frames
+        return frames
+
+    def __getitem__(self, name):
+        self._frame_set.touch(name)
+        return super().__getitem__(name)
+
+
+class FrameSet:
+    """Кадры одного ассета, общие для всех питомцев; анимации декодируются по требованию"""
+
+    def __init__(self, cache, key, names, decode_animation, budget=None, source=None):
+        self.cache = cache
+        self.key = key
+        self.source = source   # путь .pet файла (None - UI спрайт)
+        self.names = set(names)
+        # Количество кадров по индексу файла (если передан словарь имя -> количество)
+        self.frame_counts = dict(names) if isinstance(names, dict) else {}
+        self.budget = budget
+        self.anim_nbytes = {}  # имя анимации -> байты кадров (вправо и сохраненные влево)
+        self.masks = {}        # имя анимации -> маски непрозрачных пикселей кадров
+        self.refcount = 0
+        self.pinned = False    # не выгружается по LRU (UI спрайты, кадры держат сами питомцы)
+        self.sheets = {}       # имя -> спрайтшит, декодированный в фоне: (anim_data, rgba, size)
+        self._decode_animation = decode_animation
+        self.right = LazyAnimations(self)
+        self.left = MirroredAnimations(self)
+
+    @property
+    def nbytes(self):
+        return sum(self.anim_nbytes.values())
+
+    def is_loaded(self, name):
+        return dict.__contains__(self.right, name)
+
+    def decode(self, name):
+        if name not in self.names:
+            raise KeyError(name)
+        with self.cache.lock:
+            if self.is_loaded(name):
+                return dict.__getitem__(self.right, name)
+            frames = self._decode_animation(name, self.sheets.pop(name, None))
+            if isinstance(frames, DeltaFrames):
+                # Кадры восстанавливаются по мере проигрывания в один буфер: без атласа,
+                # маски - по кадру
+                dict.__setitem__(self.right, name, frames)
+                self.anim_nbytes[name] = frames.nbytes
+                self.masks[name] = [pygame.mask.from_surface(frame) for frame in frames]
+                self.cache.on_decoded(self, name)
+                return frames
+            if self.cache.render_mode == 'colorkey':
+                # RLE кодирует поверхность целиком - кадры остаются отдельными, без атласа
+                prepare_colorkey_frames(frames)
+            elif self.cache.atlas is not None:
+                self.cache.atlas.add(frames, lambda frames, name=name: self.on_atlas_moved(name))
+            dict.__setitem__(self.right, name, frames)
+            unique = unique_surfaces(frames)
+            self.anim_nbytes[name] = sum(surface_nbytes(frame) for frame in unique)
+            masks = {id(frame): pygame.mask.from_surface(frame) for frame in unique}
+            self.masks[name] = [masks[id(frame)] for frame in frames]
+            self.cache.on_decoded(self, name)
+        return frames
+
+    def get_mask(self, name, index):
+        """Маска кадра (для отраженного кадра проверяйте зеркальную координату x)"""
+        self.right[name]
+        return self.masks[name][index]
+
+    def can_store(self, name, frame):
+        """Можно ли сохранить отраженный кадр в рамках бюджета набора"""
+        nbytes = surface_nbytes(frame)
+        if name not in self.anim_nbytes:
+            return False
+        if self.budget is not None and self.nbytes + nbytes > self.budget:
+            return False
+        self.anim_nbytes[name] += nbytes
+        return True
+
+    def touch(self, name):
+        self.cache.touch(self, name)
+
+    def on_atlas_moved(self, name):
+        """Кадры анимации перенесены при перепаковке атласа"""
+        left = dict.get(self.left, name)
+        if left is not None and name in self.anim_nbytes:
+            self.anim_nbytes[name] -= left.reset()
+
+    def evict(self, name):
+        """Выгружает анимацию, возвращает освобожденные байты"""
+        frames = dict.pop(self.right, name, None)
+        if frames is not None and self.cache.atlas is not None:
+            self.cache.atlas.remove(frames)
+        dict.pop(self.left, name, None)
+        self.masks.pop(name, None)
+        self.sheets.pop(name, None)
+        return self.anim_nbytes.pop(name, 0)
+
+
+class FrameHandle:
+    """Ссылка питомца на общий набор кадров, освобождается через release()"""
+
+    def __init__(self, cache, frame_set):
+        self._cache = cache
+        self.frame_set = frame_set
+
+    @property
+    def right(self):
+        return self.frame_set.right
+
+    @property
+    def left(self):
+        return self.frame_set.left
+
+    def release(self):
+        if self.frame_set is not None:
+            self._cache.release(self.frame_set)
+            self.frame_set = None
+
+
+class FrameCache:
+    """Общий для процесса кэш кадров по содержимому файлов с подсчетом ссылок.
+
+    Анимации декодируются по требованию. Если общий объем кадров превышает
+    memory_budget, выгружаются анимации, которые не использовались дольше
+    evict_after секунд (в порядке LRU).
+    """
+
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, loader=None, pet_memory_budget=None, memory_budget=None, evict_after=30.0, atlas=None,
+                 disk=None):
+        self.loader = loader or SimplePetLoader()
+        # Общий атлас кадров (None - каждый кадр отдельной поверхностью)
+        self.atlas = atlas
+        # Масштаб экрана, под который загружаются кадры питомцев
+        self.display_scale = 1.0
+        # Подготовка кадров под отрисовку (см. pet_render.RENDER_MODES)
+        self.render_mode = 'alpha'
+        # Кэш декодированных кадров на диске (None - выключен)
+        self.disk = disk
+        # Дельта-анимации восстанавливаются по мере проигрывания, а не сразу
+        self.lazy_delta = False
+        # Бюджет памяти на набор кадров: отраженные кадры сверх него не хранятся
+        self.pet_memory_budget = pet_memory_budget
+        # Общий бюджет памяти кадров для выгрузки холодных анимаций
+        self.memory_budget = memory_budget
+        self.evict_after = evict_after
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.RLock()
+        self._sets = {}            # ключ -> FrameSet
+        self._digests = {}         # (путь, mtime, размер) -> хеш содержимого
+        self._lru = OrderedDict()  # (ключ набора, анимация) -> время последнего использования
+        self._prefetch = deque()
+        self._prefetching = set()  # (ключ набора, анимация), декодируемые в фоне
+        # prefetcher(frame_set, name) - декодирование спрайтшита в фоновом потоке; готовый
+        # спрайтшит передается в finish_prefetch в потоке pygame. None - декодирование в maintain()
+        self.prefetcher = None
+
+    def content_key(self, file_path):
+        """Хеш содержимого файла (запоминается по пути, mtime и размеру)"""
+        stat = os.stat(file_path)
+        fingerprint = (os.path.realpath(file_path), stat.st_mtime_ns, stat.st_size)
+        digest = self._digests.get(fingerprint)
+        if digest is None:
+            sha = hashlib.sha1()
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(self.CHUNK_SIZE), b""):
+                    sha.update(chunk)
+            digest = sha.hexdigest()
+            self._digests[fingerprint] = digest
+        return digest
+
+    def _acquire(self, key, get_names, decode_animation, preload, pinned=False, source=None, sheets=None):
+        with self.lock:
+            frame_set = self._sets.get(key)
+            if frame_set is None:
+                self.misses += 1
+                frame_set = FrameSet(self, key, get_names(), decode_animation, self.pet_memory_budget, source)
+                frame_set.pinned = pinned
+                frame_set.sheets.update(sheets or {})
+                for name in preload:
+                    if name in frame_set.names:
+                        frame_set.decode(name)
+                self._sets[key] = frame_set
+            else:
+                self.hits += 1
+            frame_set.refcount += 1
+            return FrameHandle(self, frame_set)
+
+    def contains_pet(self, file_path):
+        """Загружены ли уже кадры этого файла"""
+        return ("pet", self.content_key(file_path), self.display_scale, self.render_mode) in self._sets
+
+    def acquire_pet(self, file_path, preload=('idle',), decoded=None):
+        """Кадры анимаций питомца из .pet файла (сразу декодируются только preload).
+
+        decoded - уже декодированные в фоне спрайтшиты {имя: (anim_data, rgba, size)},
+        из них в потоке pygame создаются только поверхности.
+        """
+        content_key = self.content_key(file_path)
+        key = ("pet", content_key, self.display_scale, self.render_mode)
+        display_scale = self.display_scale
+        decoded = dict(decoded or {})
+
+        lazy_names = set()  # дельта-анимации, которые восстанавливаются по мере проигрывания
+
+        def get_names():
+            animations = read_pet_info(file_path)["animations"]
+            if self.lazy_delta:
+                lazy_names.update(name for name, anim in animations.items() if anim.get("codec") == "delta")
+            return {name: anim.get("frame_count") for name, anim in animations.items()}
+
+        def decode(name, sheet):
+            lazy_delta = name in lazy_names
+            if sheet is not None:
+                frames = self.loader.frames_from_rgba(*sheet, lazy=lazy_delta)
+            else:
+                if self.disk is not None and not lazy_delta:
+                    frames = self.disk.load(content_key, display_scale, name)
+                    if frames is not None:
+                        return frames
+                frames = self.loader.load_animation(file_path, name, display_scale, lazy=lazy_delta)
+            if self.disk is not None and not isinstance(frames, DeltaFrames):
+                self.disk.store(content_key, display_scale, name, frames)
+            return frames
+
+        return self._acquire(key, get_names, decode, tuple(preload) + tuple(decoded),
+                             source=file_path, sheets=decoded)
+
+    def acquire_ui(self, name, file_path, frame_width, frame_height, scale=1):
+        """Кадры UI спрайта, доступны как handle.right[name]"""
+        key = ("ui", self.content_key(file_path), frame_width, frame_height, scale, self.render_mode)
+
+        def decode(_name, _sheet):
+            return self.loader.load_spritesheet(frame_width=frame_width, frame_height=frame_height,
+                                                scale=scale, file_path=file_path)
+
+        # UI спрайт рисуется, пока жив хотя бы один питомец: из атласа его не выгружаем
+        return self._acquire(key, lambda: (name,), decode, (name,), pinned=True)
+
+    def release(self, frame_set):
+        with self.lock:
+            frame_set.refcount -= 1
+            if frame_set.refcount <= 0 and self._sets.get(frame_set.key) is frame_set:
+                del self._sets[frame_set.key]
+                for name in frame_set.names:
+                    self._lru.pop((frame_set.key, name), None)
+                    frame_set.evict(name)
+
+    def prefetch(self, handle, names):
+        """Ставит анимации в очередь на декодирование в фоне (или в свободное время цикла)"""
+        for name in names:
+            if name in handle.frame_set.names:
+                self._prefetch.append((handle.frame_set, name))
+
+    def has_pending(self):
+        """Есть ли анимации в очереди prefetch"""
+        return bool(self._prefetch)
+
+    def touch(self, frame_set, name):
+        lru_key = (frame_set.key, name)
+        with self.lock:
+            if lru_key in self._lru:
+                self._lru[lru_key] = time.monotonic()
+                self._lru.move_to_end(lru_key)
+
+    def on_decoded(self, frame_set, name):
+        if frame_set.pinned:
+            self.evict_cold()
+            return
+        self._lru[(frame_set.key, name)] = time.monotonic()
+        self._lru.move_to_end((frame_set.key, name))
+        self.evict_cold()
+
+    def evict_cold(self):
+        """Выгружает давно не использованные анимации, пока объем больше бюджета"""
+        if self.memory_budget is None:
+            return
+        with self.lock:
+            total = self.nbytes
+            now = time.monotonic()
+            for lru_key in list(self._lru):
+                if total <= self.memory_budget or now - self._lru[lru_key] < self.evict_after:
+                    break
+                del self._lru[lru_key]
+                frame_set = self._sets.get(lru_key[0])
+                if frame_set is not None:
+                    total -= frame_set.evict(lru_key[1])
+                    self.evictions += 1
+
+    def maintain(self):
+        """Вызывается раз за кадр: очередь prefetch и выгрузка холодных.
+
+        С prefetcher вся очередь уходит в фоновый поток; без него декодируется
+        одна анимация за вызов.
+        """
+        while self._prefetch:
+            frame_set, name = self._prefetch.popleft()
+            if frame_set.refcount <= 0 or frame_set.is_loaded(name):
+                continue
+            if self.prefetcher is None or frame_set.source is None:
+                frame_set.decode(name)
+                break
+            if (frame_set.key, name) not in self._prefetching:
+                self._prefetching.add((frame_set.key, name))
+                self.prefetcher(frame_set, name)
+        self.evict_cold()
+
+    def finish_prefetch(self, frame_set, name, sheet, error=None):
+        """Кадры из спрайтшита, декодированного в фоне (в потоке pygame).
+
+        sheet=None - декодировать в фоне было нечего (кадры есть на диске), они
+        читаются обычным путем. При ошибке анимация декодируется при первом обращении.
+        """
+        self._prefetching.discard((frame_set.key, name))
+        if error is not None:
+            print(f"Ошибка фоновой загрузки анимации {name}: {error}")
+            return
+        if frame_set.refcount <= 0 or frame_set.is_loaded(name):
+            return
+        if sheet is not None:
+            frame_set.sheets[name] = sheet
+        frame_set.decode(name)
+
+    @property
+    def nbytes(self):
+        return sum(frame_set.nbytes for frame_set in self._sets.values())
+
+    def stats(self):
+        """Счетчики кэша для debug режима"""
+        with self.lock:
+            atlas = self.atlas.stats() if self.atlas is not None else {"pages": 0, "fill": 0.0, "repacks": 0}
+            return {
+                "atlas_pages": atlas["pages"],
+                "atlas_fill": atlas["fill"],
+                "atlas_repacks": atlas["repacks"],
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "sets": len(self._sets),
+                "animations": len(self._lru),
+                "bytes": self.nbytes,
+                "budget": self.memory_budget,
+                "policy": f"LRU >{self.evict_after:g}s" if self.memory_budget is not None else "off"
+            }
+
+
+def budget_from_env(name):
+    """Бюджет памяти в байтах из переменной окружения в МБ (None - не задан)"""
+    value = os.environ.get(name)
+    return int(float(value) * 1024 * 1024) if value else None
+
+
+# Общий кэш процесса; PET_MEMORY_BUDGET_MB - бюджет кадров одного питомца
+frame_cache = FrameCache(pet_memory_budget=budget_from_env('PET_MEMORY_BUDGET_MB'),
+                         memory_budget=256 * 1024 * 1024, atlas=TextureAtlas(),
+                         disk=DiskFrameCache(os.environ.get('PET_CACHE_DIR') or os.path.join("Cache", "frames")))
@@ -0,0 +1,123 @@
+import json
+import os
+from pet_compile import read_pet_info
+
+CATALOG_FILE = ".catalog.json"
+CATALOG_VERSION = 1
+
+
+class PetCatalog:
+    """Индекс папки с питомцами на диске, записи обновляются по mtime/размеру файла"""
+
+    def __init__(self, directory, index_path=None):
+        self.directory = directory
+        self.index_path = index_path or os.path.join(directory, CATALOG_FILE)
+        self.entries = {}  # имя файла -> запись каталога
+        self.ids = {}      # id питомца -> имя файла
+        self.load()
+
+    def load(self):
+        """Загрузка сохраненного индекса"""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") == CATALOG_VERSION:
+                self.entries = data["entries"]
+        except (OSError, ValueError, KeyError):
+            self.entries = {}
+        self._rebuild_ids()
+
+    def save(self):
+        """Атомарная запись индекса на диск"""
+        tmp_path = self.index_path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"version": CATALOG_VERSION, "entries": self.entries},
+                          f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            print(f"Ошибка сохранения каталога {self.index_path}: {e}")
+
+    def _rebuild_ids(self):
+        self.ids = {}
+        for name in sorted(self.entries):
+            pet_id = self.entries[name].get("id")
+            if pet_id is not None:
+                self.ids.setdefault(pet_id, name)
+
+    @staticmethod
+    def _fingerprint(stat):
+        return [stat.st_mtime_ns, stat.st_size]
+
+    def _read_entry(self, path, fingerprint):
+        """Чтение записи из метаданных .pet файла"""
+        try:
+            info = read_pet_info(path)
+        except Exception as e:
+            # Запоминаем битый файл, чтобы не перечитывать его до изменения
+            print(f"Ошибка чтения метаданных {path}: {e}")
+            return {"fingerprint": fingerprint, "id": None, "error": str(e)}
+
+        metadata = info["metadata"]
+        return {
+            "fingerprint": fingerprint,
+            "id": str(metadata["id"]) if metadata.get("id") is not None else None,
+            "description": metadata.get("description", ""),
+            "animations": {
+                name: {
+                    "frame_width": anim["frame_width"],
+                    "frame_height": anim["frame_height"],
+                    "frame_count": anim.get("frame_count"),
+                    "scale": anim.get("scale", 1)
+                }
+                for name, anim in info["animations"].items()
+            }
+        }
+
+    def refresh(self):
+        """Инкрементальное обновление: перечитываются только новые и измененные файлы"""
+        changed = False
+        seen = set()
+        try:
+            with os.scandir(self.directory) as it:
+                for dir_entry in it:
+                    if not dir_entry.name.lower().endswith('.pet') or not dir_entry.is_file():
+                        continue
+                    seen.add(dir_entry.name)
+                    fingerprint = self._fingerprint(dir_entry.stat())
+                    known = self.entries.get(dir_entry.name)
+                    if known is not None and known["fingerprint"] == fingerprint:
+                        continue
+                    self.entries[dir_entry.name] = self._read_entry(dir_entry.path, fingerprint)
+                    changed = True
+        except OSError as e:
+            print(f"Ошибка чтения папки {self.directory}: {e}")
+            return False
+
+        for name in set(self.entries) - seen:
+            del self.entries[name]
+            changed = True
+
+        if changed:
+            self._rebuild_ids()
+            self.save()
+        return changed
+
+    def add_file(self, path):
+        """Добавляет в каталог файл, скопированный в папку"""
+        name = os.path.basename(path)
+        self.entries[name] = self._read_entry(path, self._fingerprint(os.stat(path)))
+        self._rebuild_ids()
+        self.save()
+        return self.entries[name]
+
+    def has_file(self, name):
+        return name in self.entries
+
+    def has_id(self, pet_id):
+        return pet_id in self.ids
+
+    def pets(self):
+        """Список (имя файла, полный путь) питомцев с прочитанными метаданными"""
+        return [(name, os.path.join(self.directory, name))
+                for name in sorted(self.entries) if self.entries[name].get("id") is not None]
@@ -0,0 +1,48 @@
+import queue
+
+# Сколько команд может ждать следующего кадра
+COMMAND_QUEUE_SIZE = 256
+
+
+class CommandQueue:
+    """Команды изменения питомцев из потоков меню и трея.
+
+    post() только кладет команду в ограниченную очередь и может вызываться из
+    любого потока; выполняет команды поток pygame в drain() раз за кадр, так что
+    список питомцев меняется только между кадрами и без блокировок.
+    """
+
+    def __init__(self, handlers, maxsize=COMMAND_QUEUE_SIZE, on_post=None):
+        self.handlers = handlers  # имя команды -> функция
+        self.on_post = on_post    # вызывается после post (будит главный цикл)
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=maxsize)
+
+    def post(self, name, *args):
+        """Ставит команду в очередь; False, если очередь переполнена"""
+        if name not in self.handlers:
+            raise ValueError(f"Неизвестная команда: {name}")
+        try:
+            self._queue.put_nowait((name, args))
+        except queue.Full:
+            self.dropped += 1
+            print(f"Очередь команд переполнена, команда {name} пропущена")
+            return False
+        if self.on_post:
+            self.on_post()
+        return True
+
+    def drain(self, limit=None):
+        """Выполняет накопившиеся команды в потоке pygame; возвращает их количество"""
+        done = 0
+        while limit is None or done < limit:
+            try:
+                name, args = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            done += 1
+            try:
+                self.handlers[name](*args)
+            except Exception as e:
+                print(f"Ошибка команды {name}: {e}")
+        return done
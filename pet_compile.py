@@ -1,11 +1,149 @@
 import json
 import os
-from PIL import Image
 import io
+import mmap
+import struct
+import zlib
 import pygame
-from pygame.transform import flip
 import base64
+import bisect
+import hashlib
+import time
 import uuid
+import pet_trace
+
+# Бинарный контейнер .pet v2:
+# [заголовок][JSON индекс метаданных и анимаций][блоки данных кадров]
+PET_MAGIC = b"PET2"
+PET_FORMAT_VERSION = 2
+# magic, версия, флаги, длина индекса, смещение блока данных
+PET_HEADER = struct.Struct("<4sHHIQ")
+# Выравнивание блоков данных (raw RGBA удобно читать выровненным)
+PET_DATA_ALIGN = 16
+PET_ENCODINGS = ("png", "raw", "zlib")
+# Кодеки анимаций: sheet - спрайтшит кадров, delta - ключевые кадры и измененные области
+PET_CODECS = ("sheet", "delta")
+# Ключевой кадр не реже, чем через столько кадров: ограничивает цену перехода к кадру
+DELTA_KEYFRAME_INTERVAL = 16
+# Если изменилось больше этой доли кадра, ключевой кадр выгоднее
+DELTA_KEYFRAME_RATIO = 0.5
+# Служебные поля индекса, которые не переносятся между форматами
+_CONTAINER_KEYS = ("encoding", "data_offset", "data_length", "image_data", "variants")
+# Версия сборки: при изменении компилятора все питомцы пересобираются
+BUILD_VERSION = 4
+BUILD_CACHE_NAME = ".build_cache.json"
+
+def _pack_frames(img, frame_width, frame_height):
+    """Обрезает прозрачные поля кадров и убирает повторы.
+
+    Возвращает упакованный лист (уникальные кадры в ряд), прямоугольники
+    спрайтов на нем [x, y, w, h] и таблицу кадров [спрайт, смещение x, смещение y].
+    """
+    img = img.convert('RGBA')
+    cols = img.width // frame_width
+    rows = img.height // frame_height
+    images = []
+    frames = []
+    seen = {}  # (размер, пиксели) -> номер спрайта
+    for row in range(rows):
+        for col in range(cols):
+            left, top = col * frame_width, row * frame_height
+            frame = img.crop((left, top, left + frame_width, top + frame_height))
+            # Полностью прозрачный кадр сохраняем как 1x1
+            bbox = frame.getchannel('A').getbbox() or (0, 0, 1, 1)
+            sprite = frame.crop(bbox)
+            key = (sprite.size, sprite.tobytes())
+            index = seen.get(key)
+            if index is None:
+                index = seen[key] = len(images)
+                images.append(sprite)
+            frames.append([index, bbox[0], bbox[1]])
+
+    packed, sprites = _pack_row(images)
+    return packed, sprites, frames
+
+
+def _pack_row(images):
+    """Складывает изображения в один ряд; возвращает лист и их прямоугольники"""
+    from PIL import Image
+
+    width = sum(sprite.width for sprite in images)
+    height = max(sprite.height for sprite in images)
+    packed = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    sprites = []
+    x = 0
+    for sprite in images:
+        packed.paste(sprite, (x, 0))
+        sprites.append([x, 0, sprite.width, sprite.height])
+        x += sprite.width
+    return packed, sprites
+
+
+def _grid_frames(img, frame_width, frame_height):
+    """Кадры спрайтшита по строкам"""
+    img = img.convert('RGBA')
+    return [img.crop((col * frame_width, row * frame_height, (col + 1) * frame_width, (row + 1) * frame_height))
+            for row in range(img.height // frame_height) for col in range(img.width // frame_width)]
+
+
+def _delta_encode(frames, keyframe_interval=DELTA_KEYFRAME_INTERVAL):
+    """Кодирует кадры как ключевые кадры и измененные области.
+
+    Возвращает лист областей, их прямоугольники [x, y, w, h] и таблицу кадров
+    [область или -1, x, y, ключевой]: ключевой кадр очищает буфер, область
+    заменяет пиксели буфера в (x, y), -1 без ключевого - кадр не изменился.
+    """
+    from PIL import Image, ImageChops
+
+    images = []
+    deltas = []
+    previous = None
+    since_key = 0
+    for frame in frames:
+        width, height = frame.size
+        key = previous is None or since_key >= keyframe_interval
+        bbox = None
+        if not key:
+            bbox = ImageChops.difference(frame, previous).getbbox(alpha_only=False)
+            if bbox and (bbox[2] - bbox[0]) * (bbox[3] - bbox[1]) > DELTA_KEYFRAME_RATIO * width * height:
+                key = True
+        if key:
+            bbox = frame.getchannel('A').getbbox()
+            since_key = 0
+        if bbox:
+            images.append(frame.crop(bbox))
+            deltas.append([len(images) - 1, bbox[0], bbox[1], int(key)])
+        else:
+            deltas.append([-1, 0, 0, int(key)])
+        previous = frame
+        since_key += 1
+
+    if not images:
+        images.append(Image.new('RGBA', (1, 1), (0, 0, 0, 0)))
+    packed, patches = _pack_row(images)
+    return packed, patches, deltas
+
+
+def _delta_decode(sheet, anim):
+    """Кадры дельта-анимации как изображения PIL (для компилятора)"""
+    from PIL import Image
+
+    size = (anim["frame_width"], anim["frame_height"])
+    buffer = Image.new('RGBA', size, (0, 0, 0, 0))
+    frames = []
+    for patch, x, y, key in anim["deltas"]:
+        buffer = Image.new('RGBA', size, (0, 0, 0, 0)) if key else buffer.copy()
+        if patch >= 0:
+            px, py, pw, ph = anim["patches"][patch]
+            buffer.paste(sheet.crop((px, py, px + pw, py + ph)), (x, y))
+        frames.append(buffer)
+    return frames
+
+
+def variant_key(display_scale):
+    """Ключ варианта анимации для масштаба экрана (1.5 -> "1.5")"""
+    return f"{float(display_scale):g}"
+
 
 class SimplePetCompiler:
     def __init__(self):
@@ -15,18 +153,30 @@ class SimplePetCompiler:
             "description": ""
         }
         self.animations = {}
+        self.sheets = {}  # PNG байты спрайтшитов по имени анимации
+        self.scale_variants = ()
     
     def set_metadata(self, description=""):
         """Установка метаданных"""
         from datetime import datetime
         self.metadata.update({
-            "id": uuid.uuid4(),
+            "id": str(uuid.uuid4()),
             "created": datetime.now().isoformat(),
             "description": description
         })
     
-    def add_animation(self, name, image_path, frame_width, frame_height, scale=1):
-        """Добавление анимации из спрайтшита"""
+    def add_animation(self, name, image_path, frame_width, frame_height, scale=1, optimize=True, codec="sheet"):
+        """Добавление анимации из спрайтшита.
+
+        optimize - обрезать прозрачные поля и хранить повторяющиеся кадры один раз
+        (таблица кадров "frames" со смещениями и спрайтами "sprites").
+        codec="delta" - ключевые кадры и измененные области ("patches", "deltas"),
+        для длинных анимаций, где между кадрами меняется немного пикселей.
+        """
+        from PIL import Image
+
+        if codec not in PET_CODECS:
+            raise ValueError(f"Неизвестный кодек: {codec}")
         if not os.path.exists(image_path):
             raise FileNotFoundError(f"Файл {image_path} не найден")
         
@@ -38,66 +188,619 @@ class SimplePetCompiler:
             rows = height // frame_height
             frame_count = cols * rows
             
-            # Конвертируем в PNG bytes
-            img_bytes = io.BytesIO()
-            img.save(img_bytes, format='PNG')
-            image_data = img_bytes.getvalue()
-            
-            # Кодируем в base64
-            image_data_b64 = base64.b64encode(image_data).decode('ascii')
-            
             self.animations[name] = {
                 "frame_width": frame_width,
                 "frame_height": frame_height,
                 "frame_count": frame_count,
                 "scale": scale,
-                "image_data": image_data_b64,
                 "original_size": [width, height],
                 "frames_layout": [cols, rows]
             }
+            if codec == "delta":
+                img, patches, deltas = _delta_encode(_grid_frames(img, frame_width, frame_height))
+                self.animations[name].update(codec="delta", original_size=list(img.size), patches=patches,
+                                             deltas=deltas)
+            elif optimize:
+                img, sprites, frames = _pack_frames(img, frame_width, frame_height)
+                self.animations[name].update(original_size=list(img.size), sprites=sprites, frames=frames)
+            
+            # Конвертируем в PNG bytes
+            img_bytes = io.BytesIO()
+            img.save(img_bytes, format='PNG')
+            self.sheets[name] = img_bytes.getvalue()
+
+    def codec_stats(self):
+        """Размер и ключевые кадры дельта-анимаций (сравнение с обычным листом - codec_report)"""
+        return [{"name": name,
+                 "frames": anim["frame_count"],
+                 "keyframes": sum(key for patch, x, y, key in anim["deltas"]),
+                 "delta_bytes": len(self.sheets[name])}
+                for name, anim in self.animations.items() if anim.get("codec") == "delta"]
     
-    def compile(self, output_path):
-        """Компиляция в .pet файл"""
+    def compile(self, output_path, binary=True, encoding="png", scale_variants=()):
+        """Компиляция в .pet файл (binary=False - старый JSON формат v1).
+
+        scale_variants - масштабы экрана (например 1, 1.5, 2), для которых анимации
+        сохраняются уже масштабированными: загрузчику не нужно их пересчитывать.
+        """
         if not self.animations:
             raise ValueError("Нет анимаций для компиляции")
+        self.scale_variants = tuple(scale_variants)
         
-        # Подготавливаем структуру данных
-        data_structure = {
-            "metadata": self.metadata,
-            "animations": self.animations
+        if binary:
+            self._write_binary(output_path, encoding)
+        else:
+            self._write_json(output_path)
+        
+        print(f"Файл скомпилирован: {output_path}")
+        return True
+
+    def _bake_variant(self, name, display_scale):
+        """Спрайтшит анимации, заранее масштабированный под масштаб экрана"""
+        from PIL import Image
+
+        anim = self.animations[name]
+        factor = anim.get("scale", 1) * display_scale
+        frame_width, frame_height = anim["frame_width"], anim["frame_height"]
+        if anim.get("codec") == "delta":
+            # Кадры восстанавливаются, масштабируются и кодируются заново
+            size = (max(1, int(frame_width * factor)), max(1, int(frame_height * factor)))
+            with Image.open(io.BytesIO(self.sheets[name])) as img:
+                frames = [frame.resize(size, Image.NEAREST) for frame in _delta_decode(img.convert('RGBA'), anim)]
+            packed, patches, deltas = _delta_encode(frames)
+            img_bytes = io.BytesIO()
+            packed.save(img_bytes, format='PNG')
+            return img_bytes.getvalue(), {
+                "display_scale": display_scale,
+                "frame_width": size[0],
+                "frame_height": size[1],
+                "scale": 1,
+                "original_size": list(packed.size),
+                "codec": "delta",
+                "patches": patches,
+                "deltas": deltas
+            }
+        if "sprites" in anim:
+            sprites, table = anim["sprites"], anim["frames"]
+        else:
+            cols, rows = anim["frames_layout"]
+            sprites = [[col * frame_width, row * frame_height, frame_width, frame_height]
+                       for row in range(rows) for col in range(cols)]
+            table = [[index, 0, 0] for index in range(len(sprites))]
+
+        with Image.open(io.BytesIO(self.sheets[name])) as img:
+            img = img.convert('RGBA')
+            images = [img.crop((x, y, x + w, y + h)).resize(
+                          (max(1, int(w * factor)), max(1, int(h * factor))), Image.NEAREST)
+                      for x, y, w, h in sprites]
+        packed, packed_sprites = _pack_row(images)
+
+        img_bytes = io.BytesIO()
+        packed.save(img_bytes, format='PNG')
+        variant = {
+            "display_scale": display_scale,
+            "frame_width": int(frame_width * factor),
+            "frame_height": int(frame_height * factor),
+            "scale": 1,
+            "original_size": list(packed.size),
+            "sprites": packed_sprites,
+            "frames": [[index, int(ox * factor), int(oy * factor)] for index, ox, oy in table]
         }
+        return img_bytes.getvalue(), variant
+
+    def _sheet_entries(self, name):
+        """(ключ варианта, описание, PNG байты) для основного листа и вариантов"""
+        yield None, dict(self.animations[name]), self.sheets[name]
+        for display_scale in self.scale_variants:
+            png_bytes, variant = self._bake_variant(name, display_scale)
+            yield variant_key(display_scale), variant, png_bytes
+
+    def _encode_sheet(self, png_bytes, encoding):
+        """Кодирует спрайтшит для записи в контейнер v2"""
+        from PIL import Image
+
+        if encoding == "png":
+            return png_bytes
+        if encoding not in PET_ENCODINGS:
+            raise ValueError(f"Неизвестная кодировка: {encoding}")
+        with Image.open(io.BytesIO(png_bytes)) as img:
+            raw = img.convert('RGBA').tobytes()
+        return raw if encoding == "raw" else zlib.compress(raw)
+
+    def _write_json(self, output_path):
+        """Запись в формате v1: JSON со спрайтшитами в base64"""
+        animations = {}
+        for name in self.animations:
+            for key, entry, png_bytes in self._sheet_entries(name):
+                entry["image_data"] = base64.b64encode(png_bytes).decode('ascii')
+                if key is None:
+                    animations[name] = entry
+                else:
+                    animations[name].setdefault("variants", {})[key] = entry
         
-        # Сериализуем JSON
+        data_structure = {
+            "metadata": dict(self.metadata, format_version="1.0"),
+            "animations": animations
+        }
         json_data = json.dumps(data_structure, ensure_ascii=False, indent=2)
         
-        # Записываем в файл
         with open(output_path, 'w', encoding='utf-8') as f:
             f.write(json_data)
+
+    def _write_binary(self, output_path, encoding):
+        """Запись в формате v2: заголовок, индекс и сырые блоки данных"""
+        index_animations = {}
+        blobs = []
+        offset = 0
+        for name in self.animations:
+            for key, entry, png_bytes in self._sheet_entries(name):
+                blob = self._encode_sheet(png_bytes, encoding)
+                padding = -len(blob) % PET_DATA_ALIGN
+                entry.update(encoding=encoding, data_offset=offset, data_length=len(blob))
+                if key is None:
+                    index_animations[name] = entry
+                else:
+                    index_animations[name].setdefault("variants", {})[key] = entry
+                blobs.append(blob + b"\0" * padding)
+                offset += len(blob) + padding
         
-        print(f"Файл скомпилирован: {output_path}")
-        return True
+        index = json.dumps({
+            "metadata": dict(self.metadata, format_version="2.0"),
+            "animations": index_animations
+        }, ensure_ascii=False).encode('utf-8')
+        
+        # Блок данных начинается с выровненного смещения после индекса
+        data_offset = PET_HEADER.size + len(index)
+        data_offset += -data_offset % PET_DATA_ALIGN
+        header = PET_HEADER.pack(PET_MAGIC, PET_FORMAT_VERSION, 0, len(index), data_offset)
+        
+        with open(output_path, 'wb') as f:
+            f.write(header)
+            f.write(index)
+            f.write(b"\0" * (data_offset - PET_HEADER.size - len(index)))
+            for blob in blobs:
+                f.write(blob)
+
+
+class PetFile:
+    """Открытый .pet файл: v1 (JSON) или v2 (бинарный контейнер через mmap)"""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.version = 1
+        self.metadata = {}
+        self.animations = {}
+        self.data_offset = 0
+        self._file = None
+        self._map = None
+        self._views = []
+        self._payloads = {}
+
+        with open(file_path, 'rb') as f:
+            magic = f.read(len(PET_MAGIC))
+        if magic == PET_MAGIC:
+            self._open_binary()
+        else:
+            self._open_json()
+
+    def _open_binary(self):
+        self._file = open(self.file_path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, flags, index_length, data_offset = PET_HEADER.unpack_from(self._map, 0)
+            if version > PET_FORMAT_VERSION:
+                raise ValueError(f"Неподдерживаемая версия .pet файла: {version}")
+
+            index_start = PET_HEADER.size
+            index = json.loads(self._map[index_start:index_start + index_length].decode('utf-8'))
+            self.version = version
+            self.metadata = index["metadata"]
+            self.animations = index["animations"]
+            self.data_offset = data_offset
+        except Exception:
+            # Битый или обрезанный файл: не оставляем открытыми mmap и дескриптор
+            self.close()
+            raise
+
+    def _open_json(self):
+        with open(self.file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        self.metadata = data["metadata"]
+        for name, anim in data["animations"].items():
+            self._payloads[(name, None)] = anim.pop("image_data")
+            anim.setdefault("encoding", "png")
+            for key, variant in anim.get("variants", {}).items():
+                self._payloads[(name, key)] = variant.pop("image_data")
+                variant.setdefault("encoding", "png")
+            self.animations[name] = anim
+
+    def blob(self, name, variant=None):
+        """Данные спрайтшита анимации или ее варианта (для v2 - срез mmap без копирования)"""
+        if self._map is None:
+            return base64.b64decode(self._payloads[(name, variant)])
+        
+        anim = self.animations[name]
+        if variant is not None:
+            anim = anim["variants"][variant]
+        start = self.data_offset + anim["data_offset"]
+        view = memoryview(self._map)[start:start + anim["data_length"]]
+        self._views.append(view)
+        return view
+
+    def close(self):
+        for view in self._views:
+            view.release()
+        self._views = []
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class _JsonHeaderReader:
+    """Потоковый разбор v1 JSON: base64 данные изображений пропускаются без декодирования"""
+
+    CHUNK_SIZE = 64 * 1024
+    WHITESPACE = " \t\r\n"
+
+    def __init__(self, f):
+        self._f = f
+        self._buf = ""
+        self._pos = 0
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self):
+        chunk = self._f.read(self.CHUNK_SIZE)
+        if not chunk:
+            raise ValueError("Неожиданный конец .pet файла")
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+
+    def _peek(self):
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in self.WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            self._fill()
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise ValueError(f"Ожидался '{char}' в .pet файле")
+        self._pos += 1
+
+    def _read_value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                self._fill()
+                continue
+            # Число в конце буфера может быть обрезано - дочитываем
+            if end < len(self._buf):
+                self._pos = end
+                return value
+            self._fill()
+
+    def _skip_string(self):
+        self._expect('"')
+        while True:
+            end = self._buf.find('"', self._pos)
+            if end < 0:
+                self._pos = max(self._pos, len(self._buf) - 1)
+                self._fill()
+                continue
+            backslashes = 0
+            while self._buf[end - 1 - backslashes] == '\\':
+                backslashes += 1
+            self._pos = end + 1
+            if backslashes % 2 == 0:
+                return
+
+    def _items(self):
+        """Перебирает ключи объекта; значение читает вызывающий код"""
+        self._expect('{')
+        if self._peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self._read_value()
+            self._expect(':')
+            yield key
+            if self._peek() == ',':
+                self._pos += 1
+                continue
+            self._expect('}')
+            return
+
+    def _read_animation(self):
+        anim = {}
+        for key in self._items():
+            if key == "image_data":
+                self._skip_string()
+            elif key == "variants":
+                anim[key] = {variant: self._read_animation() for variant in self._items()}
+            else:
+                anim[key] = self._read_value()
+        anim.setdefault("encoding", "png")
+        return anim
+
+    def read(self, with_animations=True):
+        metadata = None
+        animations = {}
+        for key in self._items():
+            if key == "metadata":
+                metadata = self._read_value()
+                if not with_animations:
+                    break
+            elif key == "animations":
+                for name in self._items():
+                    animations[name] = self._read_animation()
+            else:
+                self._read_value()
+        if metadata is None:
+            raise ValueError("В .pet файле нет метаданных")
+        return {"metadata": metadata, "animations": animations}
+
+
+def read_pet_info(file_path, with_animations=True):
+    """Чтение метаданных и индекса анимаций без загрузки данных изображений"""
+    with open(file_path, 'rb') as f:
+        header = f.read(PET_HEADER.size)
+        if header[:len(PET_MAGIC)] == PET_MAGIC:
+            magic, version, flags, index_length, data_offset = PET_HEADER.unpack(header)
+            index = json.loads(f.read(index_length).decode('utf-8'))
+            if not with_animations:
+                index["animations"] = {}
+            return index
+    
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return _JsonHeaderReader(f).read(with_animations)
+
+
+class AnimationFrames(list):
+    """Кадры анимации; кадр рисуется со смещением offsets[i] от позиции питомца.
+
+    Одинаковые кадры - один и тот же объект Surface, прозрачные поля обрезаны.
+    frame_size - размер кадра до обрезки.
+    """
+
+    def __init__(self, frames, offsets=None, frame_size=None):
+        super().__init__(frames)
+        self.offsets = offsets if offsets is not None else [(0, 0)] * len(frames)
+        self.frame_size = frame_size or (frames[0].get_size() if frames else (0, 0))
+
+    def mirrored_offsets(self):
+        """Смещения тех же кадров, отраженных по горизонтали"""
+        full_width = self.frame_size[0]
+        return [(full_width - ox - frame.get_width(), oy) for frame, (ox, oy) in zip(self, self.offsets)]
+
+
+class DeltaFrames:
+    """Кадры дельта-анимации, восстанавливаемые по мере проигрывания.
+
+    Все кадры - один заранее выделенный буфер: frames[i] доводит буфер до
+    кадра i (от текущего кадра или от ближайшего ключевого) и возвращает его.
+    Поверхность действительна до следующего обращения. unpack() восстанавливает
+    все кадры сразу в обычные AnimationFrames.
+    """
+
+    def __init__(self, patches, deltas, frame_size):
+        self.patches = patches  # поверхности измененных областей
+        self.deltas = deltas    # [(область или -1, x, y, ключевой)] по кадрам
+        self.frame_size = frame_size
+        self.offsets = [(0, 0)] * len(deltas)
+        self.keyframes = [index for index, delta in enumerate(deltas) if delta[3]]
+        self.buffer = pygame.Surface(frame_size, pygame.SRCALPHA)
+        if pygame.display.get_surface() is not None:
+            self.buffer = self.buffer.convert_alpha()
+        self.current = -1
+
+    def __len__(self):
+        return len(self.deltas)
+
+    def __iter__(self):
+        for index in range(len(self.deltas)):
+            yield self[index]
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.deltas)
+        if index != self.current:
+            keyframe = self.keyframes[bisect.bisect_right(self.keyframes, index) - 1]
+            start = keyframe if self.current < keyframe or self.current > index else self.current + 1
+            for step in range(start, index + 1):
+                self._apply(self.buffer, step)
+            self.current = index
+        return self.buffer
+
+    def _apply(self, target, index):
+        patch, x, y, key = self.deltas[index]
+        if key:
+            target.fill((0, 0, 0, 0))
+        if patch >= 0:
+            source = self.patches[patch]
+            # Точная замена пикселей вместе с альфой: область очищена, ADD = копия
+            target.fill((0, 0, 0, 0), source.get_rect(topleft=(x, y)))
+            target.blit(source, (x, y), special_flags=pygame.BLEND_RGBA_ADD)
+
+    @property
+    def nbytes(self):
+        return (self.buffer.get_pitch() * self.buffer.get_height()
+                + sum(patch.get_width() * patch.get_height() * 4 for patch in self.patches))
+
+    def mirrored_offsets(self):
+        return list(self.offsets)
+
+    def unpack(self, scale=1):
+        """Все кадры сразу, как из обычного листа: обрезанные, повторы - один объект.
+
+        Кадры без масштаба - области одного заранее выделенного листа; с масштабом
+        каждый уникальный кадр масштабируется один раз.
+        """
+        width, height = self.frame_size
+        unique = sum(1 for patch, x, y, key in self.deltas if patch >= 0 or key) or 1
+        strip = pygame.Surface((width * unique, height), pygame.SRCALPHA)
+        if pygame.display.get_surface() is not None:
+            strip = strip.convert_alpha()
+        frames = []
+        offsets = []
+        seen = {}  # (размер, пиксели) -> (кадр, смещение)
+        used = 0
+        for index, (patch, x, y, key) in enumerate(self.deltas):
+            if frames and patch < 0 and not key:
+                # Кадр не изменился - тот же объект
+                frames.append(frames[-1])
+                offsets.append(offsets[-1])
+                continue
+            self[index]
+            bounds = self.buffer.get_bounding_rect()
+            if not bounds.width or not bounds.height:
+                bounds = pygame.Rect(0, 0, 1, 1)
+            content = (bounds.size, pygame.image.tobytes(self.buffer.subsurface(bounds), 'RGBA'))
+            known = seen.get(content)
+            if known is None or known[1] != bounds.topleft:
+                slot = bounds.move(width * used - bounds.x, -bounds.y)
+                strip.blit(self.buffer, slot, bounds, special_flags=pygame.BLEND_RGBA_ADD)
+                frame = strip.subsurface(slot)
+                if scale != 1:
+                    frame = pygame.transform.scale(frame, (max(1, int(bounds.width * scale)),
+                                                           max(1, int(bounds.height * scale))))
+                known = seen[content] = (frame, bounds.topleft)
+                used += 1
+            frames.append(known[0])
+            offsets.append((int(bounds.x * scale), int(bounds.y * scale)))
+        return AnimationFrames(frames, offsets, (int(width * scale), int(height * scale)))
+
 
 class SimplePetLoader:
     def __init__(self):
         self.animations = {}
     
     def load_pet_file(self, file_path):
-        """Загрузка .pet файла"""
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        data = json.loads(content)
-        return data
+        """Загрузка метаданных и индекса анимаций .pet файла (v1 или v2)"""
+        with PetFile(file_path) as pet_file:
+            return {"metadata": pet_file.metadata, "animations": pet_file.animations}
+
+    def resolve_animation(self, anim_data, display_scale=1.0):
+        """Выбирает вариант анимации под масштаб экрана.
+
+        Возвращает (ключ варианта или None, данные анимации). Если в файле есть
+        заранее масштабированные варианты, берется ближайший по масштабу из них и
+        основного листа (он - вариант для масштаба 1.0) и пересчет не нужен;
+        иначе масштаб экрана добавляется к scale анимации.
+        """
+        variants = anim_data.get("variants")
+        if variants:
+            scales = {key: float(key) for key in variants}
+            scales.setdefault(None, 1.0)
+            key = min(scales, key=lambda key: (abs(scales[key] - display_scale), -scales[key]))
+            if key is not None:
+                return key, variants[key]
+        if display_scale == 1:
+            return None, anim_data
+        return None, dict(anim_data, scale=anim_data.get("scale", 1) * display_scale)
+
+    @pet_trace.traced('decode_sheet', 'load')
+    def decode_sheet(self, anim_data, blob):
+        """Декодирует спрайтшит анимации из данных контейнера"""
+        encoding = anim_data.get("encoding", "png")
+        if encoding == "png":
+            return pygame.image.load(io.BytesIO(blob)).convert_alpha()
+        if encoding == "zlib":
+            blob = zlib.decompress(blob)
+        elif encoding != "raw":
+            raise ValueError(f"Неизвестная кодировка: {encoding}")
+        size = tuple(anim_data["original_size"])
+        return pygame.image.frombuffer(blob, size, 'RGBA').convert_alpha()
 
-    def load_spritesheet(self, frame_width, frame_height, file_path=None, scale=1, image_data_b64=None):
+    def decode_sheet_rgba(self, anim_data, blob):
+        """Декодирует спрайтшит в RGBA байты без pygame (можно вызывать из рабочих потоков)"""
+        from PIL import Image
+
+        encoding = anim_data.get("encoding", "png")
+        if encoding == "png":
+            with Image.open(io.BytesIO(blob)) as img:
+                img = img.convert('RGBA')
+                return img.tobytes(), img.size
+        size = tuple(anim_data["original_size"])
+        if encoding == "zlib":
+            return zlib.decompress(blob), size
+        if encoding == "raw":
+            return bytes(blob), size
+        raise ValueError(f"Неизвестная кодировка: {encoding}")
+
+    def frames_from_rgba(self, anim_data, rgba, size, lazy=False):
+        """Кадры анимации из готовых RGBA байт (только поток pygame)"""
+        sheet = pygame.image.frombuffer(rgba, size, 'RGBA').convert_alpha()
+        return self.frames_from_sheet(anim_data, sheet, lazy)
+
+    def frames_from_sheet(self, anim_data, sheet, lazy=False):
+        """Кадры анимации из декодированного листа.
+
+        lazy - для дельта-анимаций вернуть DeltaFrames, восстанавливающие кадры
+        по мере проигрывания; иначе все кадры восстанавливаются сразу.
+        """
+        if anim_data.get("codec") == "delta":
+            scale = anim_data.get("scale", 1)
+            if lazy:
+                return self.load_delta_frames(sheet, anim_data, scale)
+            return self.load_delta_frames(sheet, anim_data).unpack(scale)
+        return self.load_spritesheet(
+            sheet=sheet,
+            frame_width=anim_data["frame_width"],
+            frame_height=anim_data["frame_height"],
+            scale=anim_data.get("scale", 1),
+            sprites=anim_data.get("sprites"),
+            frame_table=anim_data.get("frames")
+        )
 
-        if image_data_b64 is not None:
+    @pet_trace.traced('load_delta_frames', 'load')
+    def load_delta_frames(self, sheet, anim_data, scale=1):
+        """DeltaFrames из листа измененных областей (области масштабируются по отдельности)"""
+        patches = []
+        for x, y, w, h in anim_data["patches"]:
+            patch = sheet.subsurface(pygame.Rect(x, y, w, h))
+            if scale != 1:
+                patch = pygame.transform.scale(patch, (max(1, int(w * scale)), max(1, int(h * scale))))
+            patches.append(patch)
+        deltas = [(patch, int(x * scale), int(y * scale), key) for patch, x, y, key in anim_data["deltas"]]
+        frame_size = (int(anim_data["frame_width"] * scale), int(anim_data["frame_height"] * scale))
+        return DeltaFrames(patches, deltas, frame_size)
+
+    @pet_trace.traced('load_spritesheet', 'load')
+    def load_spritesheet(self, frame_width, frame_height, file_path=None, scale=1, image_data_b64=None, sheet=None,
+                         sprites=None, frame_table=None):
+
+        if sheet is None and image_data_b64 is not None:
             # Декодируем из base64
             image_data = base64.b64decode(image_data_b64)
             img_stream = io.BytesIO(image_data)
             sheet = pygame.image.load(img_stream).convert_alpha()
-        elif file_path is not None:
+        elif sheet is None and file_path is not None:
             sheet = pygame.image.load(file_path).convert_alpha()
+        frame_size = (int(frame_width * scale), int(frame_height * scale))
+        if sprites is not None:
+            # Упакованный лист: каждый уникальный спрайт масштабируется один раз
+            surfaces = []
+            for x, y, w, h in sprites:
+                sprite = sheet.subsurface(pygame.Rect(x, y, w, h))
+                if scale != 1:
+                    sprite = pygame.transform.scale(sprite, (max(1, int(w * scale)), max(1, int(h * scale))))
+                surfaces.append(sprite)
+            return AnimationFrames([surfaces[index] for index, ox, oy in frame_table],
+                                   [(int(ox * scale), int(oy * scale)) for index, ox, oy in frame_table],
+                                   frame_size)
+
         frames = []
         for y in range(0, sheet.get_height(), frame_height):
             for x in range(0, sheet.get_width(), frame_width):
@@ -106,35 +809,50 @@ class SimplePetLoader:
                     new_size = (int(frame_width * scale), int(frame_height * scale))
                     frame = pygame.transform.scale(frame, new_size)
                 frames.append(frame)
-        return frames
+        return AnimationFrames(frames, frame_size=frame_size)
 
-    def load_all_animations(self, file_path):
-        data = self.load_pet_file(file_path)
-        
+    def _load_animation(self, pet_file, name, display_scale=1.0, lazy=False):
+        key, anim_data = self.resolve_animation(pet_file.animations[name], display_scale)
+        return self.frames_from_sheet(anim_data, self.decode_sheet(anim_data, pet_file.blob(name, key)), lazy)
+
+    def load_animation(self, file_path, name, display_scale=1.0, lazy=False):
+        """Загрузка кадров одной анимации (вправо)"""
+        with PetFile(file_path) as pet_file:
+            return self._load_animation(pet_file, name, display_scale, lazy)
+
+    @pet_trace.traced('load_all_animations', 'load')
+    def load_all_animations(self, file_path, mirror=True, display_scale=1.0):
+        """Загрузка всех анимаций; при mirror=False отраженные кадры не создаются (left = None)"""
         animations_right = {}
-        animations_left = {}
+        animations_left = {} if mirror else None
         
-        for name, anim_data in data["animations"].items():
-            # Загружаем оригинальные кадры (вправо)
-            frames_right = self.load_spritesheet(
-                image_data_b64=anim_data["image_data"],
-                frame_width=anim_data["frame_width"], 
-                frame_height=anim_data["frame_height"],
-                scale=anim_data.get("scale", 1)
-            )
-            
-            # Сохраняем в right
-            animations_right[name] = frames_right
+        with PetFile(file_path) as pet_file:
+            for name in pet_file.animations:
+                # Загружаем оригинальные кадры (вправо)
+                frames_right = self._load_animation(pet_file, name, display_scale)
             
-            # Создаем отраженные кадры (влево)
-            frames_left = [pygame.transform.flip(frame, True, False) for frame in frames_right]
-            animations_left[name] = frames_left
+                # Сохраняем в right
+                animations_right[name] = frames_right
+                
+                # Создаем отраженные кадры (влево)
+                if mirror:
+                    flipped = {}
+                    for frame in frames_right:
+                        if id(frame) not in flipped:
+                            flipped[id(frame)] = pygame.transform.flip(frame, True, False)
+                    animations_left[name] = AnimationFrames([flipped[id(frame)] for frame in frames_right],
+                                                            frames_right.mirrored_offsets(),
+                                                            frames_right.frame_size)
         
         return animations_right, animations_left
     
+    def get_pet_id(self, file_path):
+        """Получение id питомца (читаются только метаданные)"""
+        return read_pet_info(file_path, with_animations=False)["metadata"]["id"]
+
     def get_pet_info(self, file_path):
-        """Получение информации об анимациях в файле"""
-        data = self.load_pet_file(file_path)
+        """Получение информации об анимациях в файле (без данных изображений)"""
+        data = read_pet_info(file_path)
         
         """
         print("=== Метаданные ===")
@@ -163,4 +881,302 @@ class SimplePetLoader:
     compiler.add_animation("Анимация3", "Спрайтшит3.png", 32, 32, 2)
     
     compiler.compile("pet.pet")
-"""
\ No newline at end of file
+"""
+
+def _sheet_to_png(anim_data, blob):
+    """Перекодирует данные спрайтшита из контейнера обратно в PNG"""
+    from PIL import Image
+
+    encoding = anim_data.get("encoding", "png")
+    if encoding == "png":
+        return bytes(blob)
+    if encoding == "zlib":
+        blob = zlib.decompress(blob)
+    img = Image.frombytes('RGBA', tuple(anim_data["original_size"]), bytes(blob))
+    img_bytes = io.BytesIO()
+    img.save(img_bytes, format='PNG')
+    return img_bytes.getvalue()
+
+
+def codec_report(file_path, display_scale=1.0, repeat=5):
+    """Экономия дельта-анимаций файла по сравнению с обычным листом.
+
+    Обычный лист собирается из тех же кадров, оба варианта декодируются
+    загрузчиком (нужно окно pygame для convert_alpha). Для каждой дельта-анимации
+    возвращает размеры данных, лучшее время загрузки всех кадров из repeat
+    и память кадров при восстановлении сразу и по мере проигрывания.
+    """
+    from PIL import Image
+
+    loader = SimplePetLoader()
+
+    def best_time(func):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+        return min(times) * 1000
+
+    report = []
+    with PetFile(file_path) as pet_file:
+        for name, anim in pet_file.animations.items():
+            key, anim_data = loader.resolve_animation(anim, display_scale)
+            if anim_data.get("codec") != "delta":
+                continue
+            blob = bytes(pet_file.blob(name, key))
+            delta_ms = best_time(lambda: loader.frames_from_sheet(anim_data, loader.decode_sheet(anim_data, blob)))
+            lazy_ms = best_time(lambda: list(loader.frames_from_sheet(
+                anim_data, loader.decode_sheet(anim_data, blob), lazy=True)))
+
+            # Обычный лист из тех же кадров в разрешении файла
+            frames = loader.frames_from_sheet(dict(anim_data, scale=1), loader.decode_sheet(anim_data, blob))
+            width, height = frames.frame_size
+            sheet = pygame.Surface((width * len(frames), height), pygame.SRCALPHA)
+            for index, (frame, (ox, oy)) in enumerate(zip(frames, frames.offsets)):
+                sheet.blit(frame, (width * index + ox, oy), special_flags=pygame.BLEND_RGBA_ADD)
+            png_bytes = io.BytesIO()
+            pygame.image.save(sheet, png_bytes, "sheet.png")
+            plain = {"frame_width": width, "frame_height": height, "scale": anim_data.get("scale", 1),
+                     "encoding": "png"}
+            sheet_ms = best_time(lambda: loader.frames_from_sheet(plain, loader.decode_sheet(plain, png_bytes.getvalue())))
+            # Размер - как у листа, который собрал бы компилятор (обрезка полей, повторы один раз)
+            packed_bytes = io.BytesIO()
+            _pack_frames(Image.frombytes('RGBA', sheet.get_size(), pygame.image.tobytes(sheet, 'RGBA')),
+                         width, height)[0].save(packed_bytes, format='PNG')
+
+            eager = loader.frames_from_sheet(anim_data, loader.decode_sheet(anim_data, blob))
+            unique = {id(frame): frame for frame in eager}.values()
+            report.append({
+                "name": name,
+                "frames": len(anim_data["deltas"]),
+                "keyframes": sum(delta[3] for delta in anim_data["deltas"]),
+                "delta_bytes": len(blob),
+                "sheet_bytes": len(packed_bytes.getvalue()),
+                "delta_ms": delta_ms,
+                "lazy_ms": lazy_ms,
+                "sheet_ms": sheet_ms,
+                "eager_bytes": sum(frame.get_width() * frame.get_height() * 4 for frame in unique),
+                "lazy_bytes": loader.frames_from_sheet(anim_data, loader.decode_sheet(anim_data, blob),
+                                                       lazy=True).nbytes
+            })
+    return report
+
+
+def convert_pet_file(source_path, output_path, binary=True, encoding="png", scale_variants=None):
+    """Конвертация .pet файла между форматами v1 (JSON) и v2 (бинарный).
+
+    scale_variants=None - запечь те же варианты масштаба, что и в исходном файле.
+    """
+    compiler = SimplePetCompiler()
+    with PetFile(source_path) as pet_file:
+        compiler.metadata.update(pet_file.metadata)
+        if scale_variants is None:
+            scale_variants = sorted({float(key) for anim_data in pet_file.animations.values()
+                                     for key in anim_data.get("variants", ())})
+        for name, anim_data in pet_file.animations.items():
+            compiler.animations[name] = {key: value for key, value in anim_data.items()
+                                         if key not in _CONTAINER_KEYS}
+            compiler.sheets[name] = _sheet_to_png(anim_data, pet_file.blob(name))
+    return compiler.compile(output_path, binary=binary, encoding=encoding, scale_variants=scale_variants)
+
+
+def load_manifest(manifest_path):
+    """Читает манифест сборки и раскрывает значения по умолчанию.
+
+    {
+      "output_dir": "build",
+      "defaults": {"frame_width": 32, "frame_height": 32, "scale": 2, "encoding": "png",
+                   "scale_variants": [1, 1.5, 2]},
+      "pets": [
+        {"name": "cat", "description": "Кот", "animations": {"idle": {"image": "cat/idle.png"},
+                                                              "sleep": {"image": "cat/sleep.png", "codec": "delta"}}}
+      ]
+    }
+
+    Пути считаются от папки манифеста. Без "id" у питомца id выводится из имени,
+    чтобы он не менялся при пересборке.
+    """
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    defaults = manifest.get("defaults", {})
+    output_dir = os.path.join(base_dir, manifest.get("output_dir", "build"))
+
+    pets = []
+    for pet in manifest["pets"]:
+        animations = {}
+        for name, anim in pet["animations"].items():
+            anim = dict(defaults, **anim)
+            anim.pop("encoding", None)
+            anim.pop("scale_variants", None)
+            anim["image"] = os.path.join(base_dir, anim["image"])
+            animations[name] = anim
+        pets.append({
+            "name": pet["name"],
+            "id": pet.get("id") or str(uuid.uuid5(uuid.NAMESPACE_URL, f"pet:{pet['name']}")),
+            "description": pet.get("description", ""),
+            "encoding": pet.get("encoding", defaults.get("encoding", "png")),
+            "scale_variants": pet.get("scale_variants", defaults.get("scale_variants", [])),
+            "animations": animations,
+            "output": os.path.join(output_dir, f"{pet['name']}.pet")
+        })
+    return output_dir, pets
+
+
+def pet_build_hash(pet):
+    """Хэш всего, от чего зависит результат: параметров и содержимого спрайтшитов"""
+    digest = hashlib.sha256()
+    params = {key: value for key, value in pet.items() if key != "output"}
+    digest.update(json.dumps([BUILD_VERSION, PET_FORMAT_VERSION, params], sort_keys=True).encode('utf-8'))
+    for name in sorted(pet["animations"]):
+        with open(pet["animations"][name]["image"], 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def compile_manifest_pet(pet):
+    """Собирает одного питомца из манифеста (выполняется в процессе пула).
+
+    Вывод компилятора возвращается вместе с результатом и печатается основным
+    процессом, чтобы сообщения параллельных сборок не перемешивались.
+    """
+    from contextlib import redirect_stdout
+
+    start = time.perf_counter()
+    output = io.StringIO()
+    with redirect_stdout(output):
+        compiler = SimplePetCompiler()
+        compiler.set_metadata(pet["description"])
+        compiler.metadata["id"] = pet["id"]
+        for name, anim in pet["animations"].items():
+            compiler.add_animation(name, anim["image"], anim["frame_width"], anim["frame_height"],
+                                   anim.get("scale", 1), codec=anim.get("codec", "sheet"))
+        compiler.compile(pet["output"], encoding=pet["encoding"], scale_variants=pet["scale_variants"])
+    frames = sum(anim["frame_count"] for anim in compiler.animations.values())
+    return (time.perf_counter() - start, os.path.getsize(pet["output"]), frames, compiler.codec_stats(),
+            output.getvalue())
+
+
+def build_manifest(manifest_path, jobs=None, force=False):
+    """Параллельная сборка питомцев из манифеста; неизменившиеся пропускаются.
+
+    Возвращает количество ошибок.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    output_dir, pets = load_manifest(manifest_path)
+    os.makedirs(output_dir, exist_ok=True)
+    cache_path = os.path.join(output_dir, BUILD_CACHE_NAME)
+    cache = {}
+    if not force and os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            if not isinstance(cache, dict):
+                raise ValueError("ожидался объект JSON")
+        except (OSError, ValueError) as e:
+            # Поврежденный кэш - как пустой: сборка не должна из-за него падать
+            print(f"Кэш сборки не прочитан ({e}), собираются все питомцы")
+            cache = {}
+
+    start = time.perf_counter()
+    todo = {}
+    skipped = 0
+    errors = 0
+    for pet in pets:
+        try:
+            build_hash = pet_build_hash(pet)
+        except OSError as e:
+            errors += 1
+            print(f"{pet['name']}: ошибка: {e}")
+            continue
+        if cache.get(pet["name"]) == build_hash and os.path.exists(pet["output"]):
+            skipped += 1
+            print(f"{pet['name']}: без изменений")
+        else:
+            todo[pet["name"]] = (pet, build_hash)
+
+    built = 0
+    total_size = 0
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {name: pool.submit(compile_manifest_pet, pet) for name, (pet, build_hash) in todo.items()}
+        for name, future in futures.items():
+            try:
+                seconds, size, frames, codec_stats, output = future.result()
+            except Exception as e:
+                errors += 1
+                cache.pop(name, None)
+                print(f"{name}: ошибка: {e}")
+                continue
+            cache[name] = todo[name][1]
+            built += 1
+            total_size += size
+            print(output, end="")
+            print(f"{name}: {seconds * 1000:.0f} мс, {size / 1024:.1f} КБ, кадров {frames}")
+            for stats in codec_stats:
+                print(f"  {stats['name']}: дельта {stats['delta_bytes'] / 1024:.1f} КБ, "
+                      f"ключевых кадров {stats['keyframes']} из {stats['frames']}")
+
+    # Кэш сохраняется атомарно, чтобы прерванная сборка не испортила его
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp_path, cache_path)
+
+    print(f"Собрано: {built}, пропущено: {skipped}, ошибок: {errors}, "
+          f"{total_size / 1024:.1f} КБ за {time.perf_counter() - start:.2f} с")
+    return errors
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Инструменты для .pet файлов")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert = commands.add_parser("convert", help="Конвертация между форматами v1 и v2")
+    convert.add_argument("source")
+    convert.add_argument("output")
+    convert.add_argument("--format", choices=("binary", "json"), default="binary")
+    convert.add_argument("--encoding", choices=PET_ENCODINGS, default="png")
+    convert.add_argument("--scale-variants", default=None,
+                         help="Масштабы экрана через запятую, например 1,1.5,2 "
+                              "(по умолчанию - как в исходном файле, пустая строка - без вариантов)")
+
+    build = commands.add_parser("build", help="Сборка питомцев по манифесту")
+    build.add_argument("manifest")
+    build.add_argument("--jobs", type=int, default=None, help="Количество процессов")
+    build.add_argument("--force", action="store_true", help="Пересобрать все, игнорируя кэш")
+
+    report = commands.add_parser("report", help="Экономия дельта-анимаций по сравнению с обычным листом")
+    report.add_argument("file")
+    report.add_argument("--display-scale", type=float, default=1.0)
+    report.add_argument("--repeat", type=int, default=5)
+
+    args = parser.parse_args(argv)
+    if args.command == "report":
+        pygame.display.set_mode((1, 1), pygame.HIDDEN)
+        rows = codec_report(args.file, args.display_scale, args.repeat)
+        if not rows:
+            print("В файле нет дельта-анимаций")
+        for row in rows:
+            print(f"{row['name']}: кадров {row['frames']}, ключевых {row['keyframes']}")
+            print(f"  размер: {row['delta_bytes'] / 1024:.1f} КБ вместо {row['sheet_bytes'] / 1024:.1f} КБ "
+                  f"({row['delta_bytes'] / row['sheet_bytes'] - 1:+.0%})")
+            print(f"  загрузка: {row['delta_ms']:.2f} мс вместо {row['sheet_ms']:.2f} мс "
+                  f"({row['delta_ms'] / row['sheet_ms'] - 1:+.0%}), по мере проигрывания {row['lazy_ms']:.2f} мс")
+            print(f"  память кадров: {row['eager_bytes'] / 1024:.1f} КБ, "
+                  f"по мере проигрывания {row['lazy_bytes'] / 1024:.1f} КБ")
+    elif args.command == "convert":
+        convert_pet_file(args.source, args.output,
+                         binary=args.format == "binary", encoding=args.encoding,
+                         scale_variants=None if args.scale_variants is None else
+                         [float(value) for value in args.scale_variants.split(',') if value])
+    elif args.command == "build":
+        return 1 if build_manifest(args.manifest, jobs=args.jobs, force=args.force) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
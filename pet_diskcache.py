@@ -0,0 +1,148 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+import pygame
+from pet_compile import AnimationFrames, variant_key
+
+FRAME_CACHE_MAGIC = b"PETF"
+# Увеличивать при любом изменении того, какие кадры выдает загрузчик
+FRAME_CACHE_VERSION = 1
+# magic, версия, резерв, длина индекса
+FRAME_CACHE_HEADER = struct.Struct("<4sHHI")
+FRAME_CACHE_ALIGN = 16
+FRAME_CACHE_SUFFIX = ".frames"
+
+
+class DiskFrameCache:
+    """Декодированные кадры на диске для быстрого повторного запуска.
+
+    Файл на анимацию: заголовок, JSON индекс (размеры спрайтов, таблица кадров
+    со смещениями) и выровненные RGBA пиксели уже масштабированных спрайтов.
+    Имя файла - хеш содержимого .pet файла, масштаб экрана, анимация и версия
+    формата. Чтение - mmap и pygame.image.frombuffer, без разбора PNG и
+    масштабирования. Если файлы занимают больше max_bytes, удаляются давно
+    не использованные (время использования - mtime файла).
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pet-disk-cache')
+
+    def path_for(self, content_key, display_scale, name):
+        # Имена анимаций бывают любыми, в имени файла - их хеш
+        name_key = hashlib.sha1(name.encode('utf-8')).hexdigest()[:12]
+        filename = f"{content_key}-{variant_key(display_scale)}-{name_key}.v{FRAME_CACHE_VERSION}{FRAME_CACHE_SUFFIX}"
+        return os.path.join(self.directory, filename)
+
+    def contains(self, content_key, display_scale, name):
+        return os.path.exists(self.path_for(content_key, display_scale, name))
+
+    def load(self, content_key, display_scale, name):
+        """Кадры анимации из кэша или None"""
+        path = self.path_for(content_key, display_scale, name)
+        try:
+            with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                frames = self._read(data)
+        except (OSError, ValueError, struct.error):
+            self.misses += 1
+            return None
+        self.hits += 1
+        try:
+            # Отметка использования для LRU очистки
+            os.utime(path)
+        except OSError:
+            pass
+        return frames
+
+    def _read(self, data):
+        magic, version, reserved, index_length = FRAME_CACHE_HEADER.unpack_from(data, 0)
+        if magic != FRAME_CACHE_MAGIC or version != FRAME_CACHE_VERSION:
+            raise ValueError("Устаревший файл кэша кадров")
+        start = FRAME_CACHE_HEADER.size
+        index = json.loads(data[start:start + index_length].decode('utf-8'))
+
+        sprites = []
+        for offset, width, height in index["sprites"]:
+            view = memoryview(data)[offset:offset + width * height * 4]
+            raw = pygame.image.frombuffer(view, (width, height), 'RGBA')
+            sprites.append(raw.convert_alpha() if pygame.display.get_surface() is not None else raw.copy())
+            # Поверхность держит буфер mmap - отпускаем до закрытия файла
+            del raw
+            view.release()
+        return AnimationFrames([sprites[index] for index, ox, oy in index["frames"]],
+                               [(ox, oy) for index, ox, oy in index["frames"]],
+                               tuple(index["frame_size"]))
+
+    def store(self, content_key, display_scale, name, frames):
+        """Сохраняет кадры; пиксели копируются сейчас, запись на диск - в фоне"""
+        unique = {}
+        for frame in frames:
+            if id(frame) not in unique:
+                unique[id(frame)] = (len(unique), frame)
+        pixels = [(frame.get_width(), frame.get_height(), pygame.image.tobytes(frame, 'RGBA'))
+                  for index, frame in unique.values()]
+        table = [[unique[id(frame)][0], ox, oy] for frame, (ox, oy) in zip(frames, frames.offsets)]
+        path = self.path_for(content_key, display_scale, name)
+        self._writer.submit(self._write, path, pixels, table, list(frames.frame_size))
+
+    def _write(self, path, pixels, table, frame_size):
+        # Смещения данных зависят от длины индекса, а она - от смещений: считаем с запасом
+        sizes = [width * height * 4 for width, height, data in pixels]
+        index_length = 0
+        while True:
+            offset = FRAME_CACHE_HEADER.size + index_length
+            offset += -offset % FRAME_CACHE_ALIGN
+            sprites = []
+            for (width, height, data), size in zip(pixels, sizes):
+                sprites.append([offset, width, height])
+                offset += size + -size % FRAME_CACHE_ALIGN
+            index = json.dumps({"sprites": sprites, "frames": table, "frame_size": frame_size}).encode('utf-8')
+            if len(index) <= index_length:
+                break
+            index_length = len(index) + 64
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(FRAME_CACHE_HEADER.pack(FRAME_CACHE_MAGIC, FRAME_CACHE_VERSION, 0, len(index)))
+                f.write(index)
+                for (width, height, data), (offset, w, h) in zip(pixels, sprites):
+                    f.write(b"\0" * (offset - f.tell()))
+                    f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Ошибка записи кэша кадров: {e}")
+            return
+        self.cleanup()
+
+    def cleanup(self):
+        """Удаляет давно не использованные файлы, пока объем больше max_bytes"""
+        try:
+            entries = [entry for entry in os.scandir(self.directory)
+                       if entry.is_file() and entry.name.endswith(FRAME_CACHE_SUFFIX)]
+        except OSError:
+            return 0
+        stats = [(entry.stat(), entry.path) for entry in entries]
+        total = sum(stat.st_size for stat, path in stats)
+        removed = 0
+        for stat, path in sorted(stats, key=lambda item: item[0].st_mtime):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= stat.st_size
+            removed += 1
+        return removed
+
+    def flush(self):
+        """Ждет окончания фоновой записи"""
+        self._writer.submit(lambda: None).result()
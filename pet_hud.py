@@ -0,0 +1,120 @@
+import time
+from collections import deque
+import pygame
+
+# Фазы кадра главного цикла
+PHASES = ('update', 'draw', 'present')
+
+
+class PerfHud:
+    """Debug панель производительности.
+
+    Шрифт создается один раз, строки текста перерисовываются только когда
+    меняется их содержимое, а сами значения обновляются не чаще REFRESH_INTERVAL.
+    """
+
+    REFRESH_INTERVAL = 0.25
+
+    def __init__(self, font_name='Arial', font_size=18, line_height=20, history=240):
+        self.font_name = font_name
+        self.font_size = font_size
+        self.line_height = line_height
+        self.frame_times = deque(maxlen=history)      # время работы кадра (с)
+        self.frame_intervals = deque(maxlen=history)  # время между началами кадров (с)
+        self.phase_times = {name: deque(maxlen=history) for name in PHASES}
+        self.pet_times = {}                           # питомец -> (update, draw) за последний кадр
+        self.event_depth = 0
+        self.max_event_depth = 0
+        self.version = 0                              # меняется при изменении текста
+        self._font = None
+        self._lines = []
+        self._slots = []                              # (текст, поверхность) по строкам
+        self._panel = None
+        self._panel_version = -1
+        self._last_refresh = 0.0
+        self._last_frame_start = None
+
+    def record_frame(self, start, end):
+        if self._last_frame_start is not None:
+            self.frame_intervals.append(start - self._last_frame_start)
+        self._last_frame_start = start
+        self.frame_times.append(end - start)
+
+    def record_phase(self, name, seconds):
+        self.phase_times[name].append(seconds)
+
+    def record_events(self, count):
+        self.event_depth = count
+        self.max_event_depth = max(self.max_event_depth, count)
+
+    def record_pet(self, pet, update=None, draw=None):
+        prev_update, prev_draw = self.pet_times.get(pet, (0.0, 0.0))
+        self.pet_times[pet] = (prev_update if update is None else update,
+                               prev_draw if draw is None else draw)
+
+    def timed_draw(self, pet):
+        """Обертка pet.draw с замером времени отрисовки питомца"""
+        def draw(screen):
+            start = time.perf_counter()
+            pet.draw(screen)
+            self.record_pet(pet, draw=time.perf_counter() - start)
+        return draw
+
+    def forget_pets(self, pets):
+        """Убирает статистику удаленных питомцев"""
+        alive = set(pets)
+        for pet in [pet for pet in self.pet_times if pet not in alive]:
+            del self.pet_times[pet]
+
+    @staticmethod
+    def percentile(values, q):
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    @staticmethod
+    def mean(values):
+        return sum(values) / len(values) if values else 0.0
+
+    def fps(self):
+        interval = self.mean(self.frame_intervals)
+        return 1.0 / interval if interval else 0.0
+
+    def should_refresh(self):
+        return time.perf_counter() - self._last_refresh >= self.REFRESH_INTERVAL
+
+    def set_lines(self, lines):
+        self._last_refresh = time.perf_counter()
+        if lines != self._lines:
+            self._lines = list(lines)
+            self.version += 1
+
+    def get_size(self, width=420):
+        return width, len(self._lines) * self.line_height + 20
+
+    def _render_line(self, index, text):
+        if index < len(self._slots) and self._slots[index][0] == text:
+            return self._slots[index][1]
+        if self._font is None:
+            self._font = pygame.font.SysFont(self.font_name, self.font_size)
+        surface = self._font.render(text, False, (255, 255, 255))
+        if index < len(self._slots):
+            self._slots[index] = (text, surface)
+        else:
+            self._slots.append((text, surface))
+        return surface
+
+    def draw(self, screen, rect):
+        """Рисует панель; поверхность панели пересобирается только при изменении текста"""
+        if self._panel is None or self._panel.get_size() != rect.size:
+            self._panel = pygame.Surface(rect.size, pygame.SRCALPHA)
+            self._panel_version = -1
+        if self._panel_version != self.version:
+            self._panel.fill((0, 0, 0, 200))
+            for i, line in enumerate(self._lines):
+                self._panel.blit(self._render_line(i, line), (10, 10 + i * self.line_height))
+            del self._slots[len(self._lines):]
+            pygame.draw.rect(self._panel, (255, 255, 255), self._panel.get_rect(), 1)
+            self._panel_version = self.version
+        screen.blit(self._panel, rect.topleft)
@@ -0,0 +1,120 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pet_compile import PetFile, SimplePetLoader
+from pet_cache import frame_cache
+import pet_trace
+
+
+class PetLoadJob:
+    """Фоновая загрузка одного питомца"""
+
+    def __init__(self, file_path, on_done):
+        self.file_path = file_path
+        self.on_done = on_done  # on_done(pet, error), вызывается в потоке pygame
+        self.decoded = {}       # имя -> (anim_data, rgba, size)
+        self.error = None
+
+
+class PetLoadingPipeline:
+    """Загрузка питомцев без блокировки меню и отрисовки.
+
+    Пул потоков читает файл и декодирует спрайтшиты в RGBA байты (PIL
+    отпускает GIL). Поток pygame забирает готовые задания в drain() и делает
+    только дешевую часть: поверхности из буферов, разрезку на кадры и DesktopPet.
+    """
+
+    def __init__(self, pet_factory, preload=('idle', 'run'), max_workers=2, on_ready=None):
+        self.pet_factory = pet_factory  # pet_factory(file_path, frames) -> питомец
+        self.preload = preload
+        self.on_ready = on_ready        # вызывается из рабочего потока, когда задание готово
+        self.loader = SimplePetLoader()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pet-load')
+        self._ready = queue.Queue()
+        self._lock = threading.Lock()
+        self.pending = 0
+
+    def submit(self, file_path, on_done):
+        """Ставит файл в очередь загрузки (можно вызывать из любого потока)"""
+        job = PetLoadJob(file_path, on_done)
+        with self._lock:
+            self.pending += 1
+        self._executor.submit(self._work, job)
+        return job
+
+    @pet_trace.traced('load_job', 'load')
+    def _work(self, job):
+        try:
+            # Кадры уже в кэше (такой питомец уже на экране) - декодировать нечего
+            if not frame_cache.contains_pet(job.file_path):
+                content_key = frame_cache.content_key(job.file_path)
+                display_scale = frame_cache.display_scale
+                with PetFile(job.file_path) as pet_file:
+                    for name in self.preload:
+                        anim_data = pet_file.animations.get(name)
+                        if anim_data is None:
+                            continue
+                        # Есть готовые кадры на диске - поток pygame прочитает их сам, это дешево
+                        if frame_cache.disk is not None and frame_cache.disk.contains(content_key, display_scale, name):
+                            continue
+                        key, anim_data = self.loader.resolve_animation(anim_data, display_scale)
+                        rgba, size = self.loader.decode_sheet_rgba(anim_data, pet_file.blob(name, key))
+                        job.decoded[name] = (anim_data, rgba, size)
+        except Exception as e:
+            job.error = e
+        self._ready.put(job)
+        if self.on_ready:
+            self.on_ready()
+
+    def prefetch(self, file_path, name, on_done):
+        """Декодирует спрайтшит анимации в фоне.
+
+        on_done(sheet, error) вызывается в рабочем потоке; sheet - (anim_data, rgba, size)
+        или None, если кадры уже есть в кэше на диске.
+        """
+        self._executor.submit(self._prefetch_work, file_path, name, on_done)
+
+    @pet_trace.traced('prefetch_job', 'load')
+    def _prefetch_work(self, file_path, name, on_done):
+        sheet = error = None
+        try:
+            display_scale = frame_cache.display_scale
+            disk = frame_cache.disk
+            if disk is None or not disk.contains(frame_cache.content_key(file_path), display_scale, name):
+                with PetFile(file_path) as pet_file:
+                    key, anim_data = self.loader.resolve_animation(pet_file.animations[name], display_scale)
+                    rgba, size = self.loader.decode_sheet_rgba(anim_data, pet_file.blob(name, key))
+                    sheet = (anim_data, rgba, size)
+        except Exception as e:
+            error = e
+        on_done(sheet, error)
+
+    def drain(self, limit=None):
+        """Завершает готовые задания в потоке pygame; возвращает их количество"""
+        done = 0
+        while limit is None or done < limit:
+            try:
+                job = self._ready.get_nowait()
+            except queue.Empty:
+                break
+            done += 1
+            with self._lock:
+                self.pending -= 1
+            pet = None
+            error = job.error
+            if error is None:
+                try:
+                    frames = frame_cache.acquire_pet(job.file_path, decoded=job.decoded)
+                    job.decoded = None
+                    try:
+                        pet = self.pet_factory(job.file_path, frames)
+                    except Exception:
+                        frames.release()
+                        raise
+                except Exception as e:
+                    error = e
+            job.on_done(pet, error)
+        return done
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
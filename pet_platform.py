@@ -0,0 +1,80 @@
+import ctypes
+
+# Константы Windows API
+WS_EX_LAYERED = 0x00080000
+WS_EX_TOOLWINDOW = 0x00000080
+GWL_EXSTYLE = -20
+HWND_TOPMOST = -1
+SWP_NOSIZE = 0x0001
+SWP_NOMOVE = 0x0002
+LWA_ALPHA = 0x00000002
+LWA_COLORKEY = 0x00000001
+LOGPIXELSX = 88
+# DPI при масштабе 100%
+BASE_DPI = 96
+
+
+class WindowsPlatform:
+    """Метрики экрана и стиль прозрачного окна через WinAPI"""
+
+    def set_dpi_awareness(self):
+        ctypes.windll.shcore.SetProcessDpiAwareness(1)
+
+    def get_screen_size(self):
+        user32 = ctypes.windll.user32
+        return user32.GetSystemMetrics(0), user32.GetSystemMetrics(1)
+
+    def get_display_scale(self):
+        """Масштаб экрана (1.0 = 96 DPI), имеет смысл после set_dpi_awareness"""
+        user32 = ctypes.windll.user32
+        try:
+            dpi = user32.GetDpiForSystem()
+        except AttributeError:
+            # До Windows 10
+            hdc = user32.GetDC(0)
+            dpi = ctypes.windll.gdi32.GetDeviceCaps(hdc, LOGPIXELSX)
+            user32.ReleaseDC(0, hdc)
+        return dpi / BASE_DPI if dpi else 1.0
+
+    def setup_overlay(self, hwnd):
+        """Окно поверх рабочего стола: без панели задач, белый цвет прозрачен"""
+        user32 = ctypes.windll.user32
+        ex_style = user32.GetWindowLongA(hwnd, GWL_EXSTYLE)
+        user32.SetWindowLongA(hwnd, GWL_EXSTYLE,
+                              ex_style | WS_EX_LAYERED | WS_EX_TOOLWINDOW)
+
+        user32.SetLayeredWindowAttributes(hwnd, 0x00FFFFFF, 255, LWA_COLORKEY)
+
+
+class HeadlessPlatform:
+    """Замена WinAPI для запуска без Windows (тесты, бенчмарки, SDL dummy драйвер)"""
+
+    def __init__(self, width=1920, height=1080, display_scale=1.0):
+        self.width = width
+        self.height = height
+        self.display_scale = display_scale
+
+    def set_dpi_awareness(self):
+        pass
+
+    def get_screen_size(self):
+        return self.width, self.height
+
+    def get_display_scale(self):
+        return self.display_scale
+
+    def setup_overlay(self, hwnd):
+        pass
+
+
+def detect_platform():
+    return WindowsPlatform() if hasattr(ctypes, 'windll') else HeadlessPlatform()
+
+
+# Текущая платформа; бенчмарки подменяют ее через set_platform
+current_platform = detect_platform()
+
+
+def set_platform(platform):
+    global current_platform
+    current_platform = platform
@@ -0,0 +1,133 @@
+import time
+import pygame
+import pet_trace
+
+# Режимы подготовки кадров: alpha - попиксельное смешивание, colorkey - 1-битная прозрачность
+RENDER_MODES = ('alpha', 'colorkey')
+# Цвет, прозрачный для окна-оверлея (SetLayeredWindowAttributes с LWA_COLORKEY)
+COLORKEY = (255, 255, 255)
+# Белый внутри питомца заменяется на почти белый, иначе он станет прозрачным
+COLORKEY_SAFE = (254, 254, 254)
+# Пиксели с альфой не больше порога прозрачны
+ALPHA_THRESHOLD = 127
+
+
+def prepare_colorkey(frame):
+    """Кадр для окна с цветовым ключом: альфа по порогу, формат экрана, ключ и RLE.
+
+    Полупрозрачные края не смешиваются с белым фоном в светлую кайму, которую
+    ключ не убирает, а blit RLE поверхности пропускает прозрачные участки целиком.
+    """
+    opaque = pygame.mask.from_surface(frame, ALPHA_THRESHOLD)
+    rgb = frame.convert() if pygame.display.get_surface() is not None else frame.copy()
+    pygame.mask.from_threshold(rgb, COLORKEY, (1, 1, 1, 255)).to_surface(
+        rgb, setcolor=COLORKEY_SAFE, unsetcolor=None)
+    result = pygame.Surface(frame.get_size(), 0, rgb)
+    result.fill(COLORKEY)
+    opaque.to_surface(result, setsurface=rgb, unsetcolor=None)
+    result.set_colorkey(COLORKEY, pygame.RLEACCEL)
+    return result
+
+
+def prepare_colorkey_frames(frames):
+    """Готовит кадры анимации на месте (одинаковые кадры остаются одним объектом)"""
+    prepared = {}
+    for index, frame in enumerate(frames):
+        result = prepared.get(id(frame))
+        if result is None:
+            result = prepared[id(frame)] = prepare_colorkey(frame)
+        frames[index] = result
+    return frames
+
+
+class DirtyRectRenderer:
+    """Перерисовка только измененных областей экрана.
+
+    Каждый кадр получает список элементов (ключ, rect, состояние, функция отрисовки).
+    Элемент грязный, если его rect или состояние изменились (состояние None -
+    перерисовывается всегда). Очищаются и выводятся только старые и новые rect
+    грязных элементов; если их площадь или количество слишком велики - полная перерисовка.
+    """
+
+    def __init__(self, screen, background=(255, 255, 255), full_redraw_ratio=0.4, max_rects=256):
+        self.screen = screen
+        self.background = background
+        self.full_redraw_ratio = full_redraw_ratio
+        self.max_rects = max_rects
+        self.screen_rect = screen.get_rect()
+        self.full_redraws = 0
+        self.partial_redraws = 0
+        self.last_dirty_area = 0
+        self.present_time = 0.0  # время вывода на экран в последнем кадре (с)
+        self._prev = {}  # ключ -> (rect, состояние)
+        self._force_full = True
+
+    def invalidate(self):
+        """Следующий кадр будет перерисован полностью"""
+        self._force_full = True
+
+    def _collect_dirty(self, items):
+        current = {}
+        dirty = []
+        for key, rect, state, draw in items:
+            current[key] = (rect, state)
+            prev = self._prev.get(key)
+            if prev is None or state is None or prev != (rect, state):
+                if prev is None or prev[0] == rect:
+                    dirty.append(rect)
+                elif prev[0].colliderect(rect):
+                    # Небольшое смещение - одна общая область вместо двух пересекающихся
+                    dirty.append(rect.union(prev[0]))
+                else:
+                    dirty.append(rect)
+                    dirty.append(prev[0])
+        for key, (rect, state) in self._prev.items():
+            if key not in current:
+                dirty.append(rect)
+        self._prev = current
+
+        clipped = []
+        for rect in dirty:
+            rect = rect.clip(self.screen_rect)
+            if rect.width and rect.height:
+                clipped.append(rect)
+        return clipped
+
+    def render(self, items):
+        """Рисует элементы и выводит изменившиеся области на экран"""
+        self.present_time = 0.0
+        dirty = self._collect_dirty(items)
+        area = sum(rect.width * rect.height for rect in dirty)
+        self.last_dirty_area = area
+
+        screen_area = self.screen_rect.width * self.screen_rect.height
+        if (self._force_full or len(dirty) > self.max_rects
+                or area > screen_area * self.full_redraw_ratio):
+            self._force_full = False
+            self.full_redraws += 1
+            self.last_dirty_area = screen_area
+            self.screen.fill(self.background)
+            for key, rect, state, draw in items:
+                draw(self.screen)
+            start = time.perf_counter()
+            with pet_trace.span('flip', 'present'):
+                pygame.display.flip()
+            self.present_time = time.perf_counter() - start
+            return
+
+        if not dirty:
+            return
+
+        self.partial_redraws += 1
+        rects = [item[1] for item in items]
+        for dirty_rect in dirty:
+            # Ограничиваем отрисовку областью, чтобы не перекрыть соседей вне нее
+            self.screen.set_clip(dirty_rect)
+            self.screen.fill(self.background, dirty_rect)
+            for index in dirty_rect.collidelistall(rects):
+                items[index][3](self.screen)
+        self.screen.set_clip(None)
+        start = time.perf_counter()
+        with pet_trace.span('update_rects', 'present', {"rects": len(dirty)}):
+            pygame.display.update(dirty)
+        self.present_time = time.perf_counter() - start
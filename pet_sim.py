@@ -0,0 +1,193 @@
+"""Фиксированный шаг симуляции, запись и воспроизведение сессий.
+
+    PET_RECORD=session.jsonl python pet.py
+    python pet_sim.py replay session.jsonl --headless --profile replay.prof
+"""
+import argparse
+import json
+import os
+import time
+
+# Частота шагов симуляции: скорость питомцев не зависит от частоты кадров
+STEP_MS = 1000 / 60
+# Сколько шагов можно догнать за кадр; больше - время симуляции отстает от реального
+MAX_CATCH_UP_STEPS = 75
+RECORDING_VERSION = 3
+
+
+class SimulationClock:
+    """Время симуляции, которое идет шагами по STEP_MS.
+
+    advance() переводит прошедшее реальное время в число шагов, остаток
+    копится и дает alpha - долю шага для интерполяции отрисовки.
+    """
+
+    def __init__(self, step_ms=STEP_MS, max_steps=MAX_CATCH_UP_STEPS):
+        self.step_ms = step_ms
+        self.max_steps = max_steps
+        self.steps = 0
+        self.accumulator = 0.0  # мс
+        self._last = None
+
+    @property
+    def time(self):
+        """Время симуляции в мс (целое, одинаковое при воспроизведении)"""
+        return int(self.steps * self.step_ms)
+
+    @property
+    def alpha(self):
+        return min(1.0, self.accumulator / self.step_ms)
+
+    def advance(self, now):
+        """Сколько шагов сделать к моменту now (perf_counter, с)"""
+        if self._last is None:
+            self._last = now
+            return 0
+        self.accumulator += (now - self._last) * 1000
+        self._last = now
+        steps = int(self.accumulator // self.step_ms)
+        if steps > self.max_steps:
+            steps = self.max_steps
+            self.accumulator = 0.0
+        else:
+            self.accumulator -= steps * self.step_ms
+        return steps
+
+
+class SessionRecorder:
+    """Запись сессии в JSON lines: заголовок с seed и настройками симуляции,
+    затем по кадру на строку.
+
+    Кадр - входные события в порядке обработки и число шагов симуляции.
+    Кадры без событий и шагов не записываются.
+    """
+
+    def __init__(self, path, seed, step_ms, screen_size, display_scale=1.0, social=True, swarm=False):
+        self.path = path
+        self._file = open(path, 'w', encoding='utf-8')
+        self._events = []
+        self._write({"version": RECORDING_VERSION, "seed": seed, "step_ms": step_ms,
+                     "screen": list(screen_size), "display_scale": display_scale,
+                     "social": social, "swarm": swarm})
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def record(self, kind, **data):
+        self._events.append(dict(data, type=kind))
+
+    def end_frame(self, steps):
+        if steps or self._events:
+            self._write({"steps": steps, "events": self._events})
+            self._events = []
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def load_recording(path):
+    """Заголовок записи и список ее кадров"""
+    with open(path, 'r', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+        if header.get("version", 0) > RECORDING_VERSION:
+            raise ValueError(f"Неподдерживаемая версия записи: {header['version']}")
+        if header.get("version", 0) < 3:
+            # До версии 3 стартовые места брались не из rng менеджера - seed питомцев не совпадут
+            print(f"Предупреждение: запись версии {header.get('version', 0)}, воспроизведение может отличаться")
+        # Записи версии 1 сделаны без этих полей - значения по умолчанию
+        header.setdefault("display_scale", 1.0)
+        header.setdefault("social", True)
+        header.setdefault("swarm", False)
+        return header, [json.loads(line) for line in f if line.strip()]
+
+
+def apply_event(manager, event):
+    """Повторяет записанное событие на менеджере"""
+    from pet import DesktopPet
+
+    kind = event["type"]
+    if kind == "add":
+        pet = DesktopPet(asset_file=event["file"])
+        manager.add_pet(pet, (event["x"], event["y"]))
+        if pet.seed != event["seed"]:
+            print(f"Предупреждение: seed питомца {pet.seed} не совпадает с записью {event['seed']}")
+    elif kind == "remove":
+        manager.remove_pet(manager.pets[event["index"]])
+    elif kind == "click":
+        manager.click_pos = tuple(event["pos"])
+        manager.handle_selection(tuple(event["pos"]))
+    else:
+        raise ValueError(f"Неизвестное событие записи: {kind}")
+
+
+def replay(path, speed=None, manager=None, render=True):
+    """Воспроизводит запись; speed=None - так быстро, как получится.
+
+    Масштаб, расталкивание и swarm берутся из заголовка записи, а не из
+    окружения. Возвращает менеджер в состоянии конца записи.
+    """
+    from pet import PetManager
+
+    header, frames = load_recording(path)
+    if manager is None:
+        manager = PetManager(tray=False, seed=header["seed"], record=False,
+                             display_scale=header["display_scale"], social=header["social"],
+                             use_swarm=header["swarm"])
+    if tuple(header["screen"]) != (manager.screen_width, manager.screen_height):
+        print(f"Предупреждение: размер экрана {header['screen']} отличается от записи")
+    settings = (manager.display_scale, manager.social is not None, manager.swarm is not None)
+    if settings != (header["display_scale"], header["social"], header["swarm"]):
+        print(f"Предупреждение: настройки менеджера (масштаб, social, swarm) {settings} отличаются от записи")
+
+    start = time.perf_counter()
+    sim_ms = 0.0
+    for frame in frames:
+        for event in frame["events"]:
+            apply_event(manager, event)
+        manager.simulate(frame["steps"])
+        if render:
+            manager.render_frame()
+        sim_ms += frame["steps"] * header["step_ms"]
+        if speed:
+            delay = start + sim_ms / 1000 / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+    return manager
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Воспроизведение записанных сессий")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    play = commands.add_parser("replay", help="Воспроизвести запись")
+    play.add_argument("recording")
+    play.add_argument("--speed", type=float, default=None, help="Скорость (1 - реальное время), по умолчанию максимальная")
+    play.add_argument("--headless", action="store_true", help="Без окна (SDL dummy драйвер)")
+    play.add_argument("--no-render", action="store_true", help="Только симуляция")
+    play.add_argument("--profile", help="Файл статистики cProfile")
+
+    args = parser.parse_args(argv)
+    if args.headless:
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'
+        import pet_platform
+        header, frames = load_recording(args.recording)
+        pet_platform.set_platform(pet_platform.HeadlessPlatform(*header["screen"],
+                                                                display_scale=header["display_scale"]))
+
+    run = lambda: replay(args.recording, speed=args.speed, render=not args.no_render)
+    start = time.perf_counter()
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        manager = profiler.runcall(run)
+        profiler.dump_stats(args.profile)
+    else:
+        manager = run()
+    print(f"Воспроизведено за {time.perf_counter() - start:.2f} с, "
+          f"время симуляции {manager.clock.time / 1000:.1f} с, питомцев {len(manager.pets)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+import math
+from pet_spatial import PointGrid
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Расстояния в пикселях при масштабе 100%
+# Ближе - питомцы расталкиваются
+SEPARATION_DISTANCE = 48
+# Насколько сильно за шаг расталкиваются перекрывающиеся питомцы (доля перекрытия)
+SEPARATION_STRENGTH = 0.25
+# На каком расстоянии питомец замечает соседа
+INTERACTION_RADIUS = 160
+# Как далеко убегает испуганный питомец
+FLEE_DISTANCE = 240
+# Как часто (мс) стоящий питомец оглядывается на соседей
+INTERACTION_INTERVAL = 3000
+# Сколько питомцев за шаг может отреагировать на соседей; остальные - на следующих шагах
+INTERACTIONS_PER_STEP = 16
+# Вероятности реакций на соседа: поздороваться, пойти следом, иначе убежать
+GREET_CHANCE = 0.5
+FOLLOW_CHANCE = 0.25
+INTERACTIONS = ('greet', 'follow', 'flee')
+# Соседние ячейки для поиска пар: сама ячейка и 4 из 8 соседних (остальные дадут те же пары)
+HALF_NEIGHBORHOOD = ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1))
+
+
+class PetSocial:
+    """Питомцы не перекрываются и реагируют на соседей.
+
+    Каждый шаг симуляции близкие пары питомцев расталкиваются. Стоящий
+    питомец раз в INTERACTION_INTERVAL смотрит на ближайшего соседа в
+    INTERACTION_RADIUS и здоровается (поворачивается к нему), идет следом или
+    убегает; за шаг реагируют не больше INTERACTIONS_PER_STEP питомцев.
+
+    С NumPy пары ищутся векторно (для swarm - прямо в его массивах), без
+    него - через равномерный хеш PointGrid. Решения берутся у rng питомца по
+    порядку списка, поэтому воспроизведение записи дает тот же результат.
+    """
+
+    def __init__(self, display_scale=1.0):
+        self.separation = SEPARATION_DISTANCE * display_scale
+        self.radius = INTERACTION_RADIUS * display_scale
+        self.flee_distance = FLEE_DISTANCE * display_scale
+        self.grid = PointGrid(cell_size=self.separation)
+        self.pushed = 0  # питомцев, сдвинутых на последнем шаге
+        self.counts = dict.fromkeys(INTERACTIONS, 0)
+
+    def step(self, pets, current_time, swarm=None):
+        """Расталкивание и реакции после шага симуляции питомцев"""
+        if len(pets) < 2:
+            self.pushed = 0
+            return
+        due = self.due_pets(pets, current_time, swarm)
+        if np is not None:
+            self.step_arrays(pets, due, current_time, swarm)
+            return
+        xs = [pet.x_pos for pet in pets]
+        ys = [pet.y_pos for pet in pets]
+        self.grid.rebuild(xs, ys)
+        self.separate(pets, xs, ys)
+        for index in due:
+            nearest, distance2 = self.nearest(index, xs, ys)
+            self.interact(pets, index, nearest, distance2, xs, ys, current_time)
+
+    def due_pets(self, pets, current_time, swarm=None):
+        """Стоящие питомцы, которым пора оглядеться (не больше INTERACTIONS_PER_STEP)"""
+        if swarm is not None:
+            n = len(pets)
+            last_social = swarm.last_social[:n]
+            due = np.flatnonzero((current_time - last_social >= INTERACTION_INTERVAL)
+                                 & ~swarm.has_target[:n])[:INTERACTIONS_PER_STEP]
+            last_social[due] = current_time
+            return due.tolist()
+        due = []
+        for index, pet in enumerate(pets):
+            if (current_time - pet.last_social_time >= INTERACTION_INTERVAL
+                    and pet.wander_target is None):
+                pet.last_social_time = current_time
+                due.append(index)
+                if len(due) == INTERACTIONS_PER_STEP:
+                    break
+        return due
+
+    def separate(self, pets, xs, ys):
+        separation = self.separation
+        push_x = [0.0] * len(pets)
+        push_y = [0.0] * len(pets)
+        pushed = set()
+        # Перекрытие меньше пикселя не исправляем, иначе питомцы сходятся к расстоянию бесконечно
+        for i, j, dx, dy, distance2 in self.grid.close_pairs(separation - 1):
+            if distance2 > 0:
+                distance = math.sqrt(distance2)
+                ux, uy = dx / distance, dy / distance
+            else:
+                # Точно в одной точке: разводим по горизонтали, направление по порядку
+                distance, ux, uy = 0.0, 1.0, 0.0
+            push = (separation - distance) * SEPARATION_STRENGTH / 2
+            push_x[i] -= ux * push
+            push_y[i] -= uy * push
+            push_x[j] += ux * push
+            push_y[j] += uy * push
+            pushed.add(i)
+            pushed.add(j)
+
+        for index in sorted(pushed):
+            pet = pets[index]
+            x = min(max(0, xs[index] + push_x[index]), pet.screen_width - 100)
+            y = min(max(0, ys[index] + push_y[index]), pet.screen_height - 100)
+            xs[index], ys[index] = x, y
+            pet.x_pos, pet.y_pos = x, y
+        self.pushed = len(pushed)
+
+    def nearest(self, index, xs, ys):
+        """Ближайший сосед в радиусе реакции: (индекс, квадрат расстояния) или (None, None)"""
+        x, y = xs[index], ys[index]
+        nearest = None
+        nearest_distance2 = None
+        for other in self.grid.query(x, y, self.radius):
+            if other == index:
+                continue
+            distance2 = (xs[other] - x) ** 2 + (ys[other] - y) ** 2
+            if nearest is None or distance2 < nearest_distance2:
+                nearest, nearest_distance2 = other, distance2
+        return nearest, nearest_distance2
+
+    def step_arrays(self, pets, due, current_time, swarm):
+        """Шаг на массивах NumPy: у swarm - его строки, иначе позиции собираются в массивы"""
+        n = len(pets)
+        if swarm is not None:
+            x, y = swarm.x[:n], swarm.y[:n]
+            max_x, max_y = swarm.screen_w[:n] - 100, swarm.screen_h[:n] - 100
+        else:
+            x = np.fromiter((pet.x_pos for pet in pets), np.float64, n)
+            y = np.fromiter((pet.y_pos for pet in pets), np.float64, n)
+            # Границы экрана проверяются ниже только для сдвинутых питомцев
+            max_x = max_y = None
+
+        moved = self.separate_arrays(x, y, max_x, max_y)
+        self.pushed = len(moved)
+        if swarm is None:
+            for index, new_x, new_y in zip(moved.tolist(), x[moved].tolist(), y[moved].tolist()):
+                pet = pets[index]
+                pet.x_pos = min(max(0.0, new_x), pet.screen_width - 100)
+                pet.y_pos = min(max(0.0, new_y), pet.screen_height - 100)
+                x[index], y[index] = pet.x_pos, pet.y_pos
+
+        limit = self.radius * self.radius
+        for index in due:
+            distance2 = (x - x[index]) ** 2 + (y - y[index]) ** 2
+            distance2[index] = np.inf
+            nearest = int(np.argmin(distance2))
+            if distance2[nearest] > limit:
+                continue
+            self.interact(pets, index, nearest, float(distance2[nearest]), x, y, current_time)
+
+    def separate_arrays(self, x, y, max_x, max_y):
+        """Расталкивание на массивах (меняет x, y на месте); возвращает индексы сдвинутых.
+
+        max_x, max_y - границы позиций; None - не ограничивать (проверит вызывающий).
+        """
+        n = len(x)
+        separation = self.separation
+        cx = (x // separation).astype(np.int64)
+        cy = (y // separation).astype(np.int64)
+        # Ключ ячейки - одно число; сдвиг по y на 1 оставляет соседей снизу и сверху в строке
+        cy -= cy.min() - 1
+        stride = int(cy.max()) + 2
+        key = cx * stride + cy
+        order = np.argsort(key, kind='stable')
+        sorted_key = key[order]
+        positions = np.arange(n)
+
+        first, second = [], []
+        for dx, dy in HALF_NEIGHBORHOOD:
+            # Искомые ключи тоже отсортированы - searchsorted идет по памяти подряд
+            target = sorted_key + (dx * stride + dy)
+            start = np.searchsorted(sorted_key, target, 'left')
+            counts = np.searchsorted(sorted_key, target, 'right') - start
+            if (dx, dy) == (0, 0):
+                # Своя ячейка: только пары с точками дальше по порядку
+                counts -= positions + 1 - start
+                start = positions + 1
+            total = int(counts.sum())
+            if not total:
+                continue
+            first.append(np.repeat(positions, counts))
+            offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            second.append(np.repeat(start, counts) + offsets)
+        if not first:
+            return positions[:0]
+        i = order[np.concatenate(first)]
+        j = order[np.concatenate(second)]
+
+        dx = x[j] - x[i]
+        dy = y[j] - y[i]
+        distance2 = dx * dx + dy * dy
+        # Перекрытие меньше пикселя не исправляем (как в separate)
+        close = distance2 < (separation - 1) ** 2
+        i, j, dx, dy, distance2 = i[close], j[close], dx[close], dy[close], distance2[close]
+        if not len(i):
+            return positions[:0]
+        distance = np.sqrt(distance2)
+        same = distance == 0
+        safe = np.where(same, 1.0, distance)
+        # Точно в одной точке: разводим по горизонтали
+        ux = np.where(same, 1.0, dx / safe)
+        uy = np.where(same, 0.0, dy / safe)
+        push = (separation - distance) * SEPARATION_STRENGTH / 2
+        push_x = np.bincount(j, ux * push, n) - np.bincount(i, ux * push, n)
+        push_y = np.bincount(j, uy * push, n) - np.bincount(i, uy * push, n)
+
+        pushed = np.zeros(n, dtype=np.bool_)
+        pushed[i] = True
+        pushed[j] = True
+        moved = np.flatnonzero(pushed)
+        x[moved] += push_x[moved]
+        y[moved] += push_y[moved]
+        if max_x is not None:
+            x[moved] = np.clip(x[moved], 0, max_x[moved])
+            y[moved] = np.clip(y[moved], 0, max_y[moved])
+        return moved
+
+    def interact(self, pets, index, nearest, nearest_distance2, xs, ys, current_time):
+        if nearest is None:
+            return
+        pet = pets[index]
+        x, y = float(xs[index]), float(ys[index])
+        neighbor = pets[nearest]
+        dx, dy = float(xs[nearest]) - x, float(ys[nearest]) - y
+        roll = pet.rng.random()
+        if roll < GREET_CHANCE:
+            kind = 'greet'
+            pet.facing_right = dx > 0
+            if neighbor.wander_target is None:
+                neighbor.facing_right = dx < 0
+            # Постоять рядом, а не уйти сразу после приветствия
+            pet.last_wander_time = current_time
+        elif roll < GREET_CHANCE + FOLLOW_CHANCE:
+            kind = 'follow'
+            # Встать рядом с соседом, а не на него
+            side = -1 if dx > 0 else 1
+            pet.set_wander_target(*self.clamp(pet, x + dx + side * self.separation, y + dy))
+        else:
+            kind = 'flee'
+            distance = math.sqrt(nearest_distance2) or 1.0
+            pet.set_wander_target(*self.clamp(pet, x - dx / distance * self.flee_distance,
+                                              y - dy / distance * self.flee_distance))
+        pet.interaction = (kind, neighbor.z)
+        self.counts[kind] += 1
+
+    @staticmethod
+    def clamp(pet, x, y):
+        return (int(min(max(0, x), pet.screen_width - 100)),
+                int(min(max(0, y), pet.screen_height - 100)))
@@ -0,0 +1,138 @@
+class SpatialGrid:
+    """Равномерная сетка для быстрого поиска объектов по точке.
+
+    Объект хранится во всех ячейках, которые пересекает его rect. update()
+    вызывается при каждом перемещении и ничего не делает, если rect не изменился.
+    """
+
+    def __init__(self, cell_size=128):
+        self.cell_size = cell_size
+        self._cells = {}  # (cx, cy) -> set объектов
+        self._items = {}  # объект -> (rect, ячейки)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, obj):
+        return obj in self._items
+
+    def _cells_for(self, rect):
+        size = self.cell_size
+        x0, y0 = rect.left // size, rect.top // size
+        x1, y1 = (rect.right - 1) // size, (rect.bottom - 1) // size
+        return tuple((cx, cy) for cx in range(x0, x1 + 1) for cy in range(y0, y1 + 1))
+
+    def update(self, obj, rect):
+        """Добавляет объект или обновляет его положение"""
+        known = self._items.get(obj)
+        if known is not None and known[0] == rect:
+            return
+        cells = self._cells_for(rect)
+        if known is not None and known[1] == cells:
+            self._items[obj] = (rect.copy(), cells)
+            return
+        if known is not None:
+            self._discard(obj, known[1])
+        for cell in cells:
+            bucket = self._cells.get(cell)
+            if bucket is None:
+                bucket = self._cells[cell] = set()
+            bucket.add(obj)
+        self._items[obj] = (rect.copy(), cells)
+
+    def _discard(self, obj, cells):
+        for cell in cells:
+            bucket = self._cells.get(cell)
+            if bucket is not None:
+                bucket.discard(obj)
+                if not bucket:
+                    del self._cells[cell]
+
+    def remove(self, obj):
+        known = self._items.pop(obj, None)
+        if known is not None:
+            self._discard(obj, known[1])
+
+    def clear(self):
+        self._cells.clear()
+        self._items.clear()
+
+    def query_point(self, point):
+        """Объекты, чей rect содержит точку"""
+        cell = (int(point[0]) // self.cell_size, int(point[1]) // self.cell_size)
+        return [obj for obj in self._cells.get(cell, ()) if self._items[obj][0].collidepoint(point)]
+
+
+class PointGrid:
+    """Равномерный хеш точек для поиска соседей в радиусе.
+
+    Перестраивается целиком каждый шаг (O(n)): точек много и почти все
+    двигаются, поэтому обновлять ячейки по одной дороже. Поиск в радиусе не
+    больше cell_size смотрит только 3x3 ячейки, поэтому при постоянной
+    плотности занимает почти постоянное время.
+    """
+
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.xs = []
+        self.ys = []
+        self._cells = {}  # (cx, cy) -> индексы точек
+
+    def rebuild(self, xs, ys):
+        self.xs, self.ys = xs, ys
+        size = self.cell_size
+        cells = {}
+        for index, (x, y) in enumerate(zip(xs, ys)):
+            cell = (int(x // size), int(y // size))
+            bucket = cells.get(cell)
+            if bucket is None:
+                cells[cell] = [index]
+            else:
+                bucket.append(index)
+        self._cells = cells
+
+    def query(self, x, y, radius):
+        """Индексы точек не дальше radius от (x, y)"""
+        size = self.cell_size
+        x0, x1 = int((x - radius) // size), int((x + radius) // size)
+        y0, y1 = int((y - radius) // size), int((y + radius) // size)
+        xs, ys, cells = self.xs, self.ys, self._cells
+        limit = radius * radius
+        found = []
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                for index in cells.get((cx, cy), ()):
+                    dx, dy = xs[index] - x, ys[index] - y
+                    if dx * dx + dy * dy <= limit:
+                        found.append(index)
+        return found
+
+    def close_pairs(self, radius):
+        """Пары (i, j, dx, dy, квадрат расстояния) точек ближе radius, каждая один раз.
+
+        radius не больше cell_size: соседи ячейки - только она сама и 4 из 8
+        соседних (остальные 4 проверят пары с другой стороны).
+        """
+        xs, ys, cells = self.xs, self.ys, self._cells
+        limit = radius * radius
+        pairs = []
+        for (cx, cy), bucket in cells.items():
+            for position, i in enumerate(bucket):
+                xi, yi = xs[i], ys[i]
+                for j in bucket[position + 1:]:
+                    dx, dy = xs[j] - xi, ys[j] - yi
+                    distance2 = dx * dx + dy * dy
+                    if distance2 < limit:
+                        pairs.append((i, j, dx, dy, distance2))
+            for neighbor in ((cx + 1, cy - 1), (cx + 1, cy), (cx + 1, cy + 1), (cx, cy + 1)):
+                other = cells.get(neighbor)
+                if other is None:
+                    continue
+                for i in bucket:
+                    xi, yi = xs[i], ys[i]
+                    for j in other:
+                        dx, dy = xs[j] - xi, ys[j] - yi
+                        distance2 = dx * dx + dy * dy
+                        if distance2 < limit:
+                            pairs.append((i, j, dx, dy, distance2))
+        return pairs
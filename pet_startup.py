@@ -0,0 +1,29 @@
+"""Замер времени запуска: импортируется первым, отметки считаются от его импорта.
+
+    PET_STARTUP_REPORT=1 python pet.py
+"""
+import os
+import time
+
+START = time.perf_counter()
+ENABLED = os.environ.get('PET_STARTUP_REPORT') == '1'
+marks = []  # (имя, мс от старта)
+
+
+def mark(name, once=True):
+    """Отмечает этап запуска; при PET_STARTUP_REPORT=1 сразу печатает его"""
+    if once and any(existing == name for existing, ms in marks):
+        return
+    ms = (time.perf_counter() - START) * 1000
+    previous = marks[-1][1] if marks else 0.0
+    marks.append((name, ms))
+    if ENABLED:
+        print(f"[startup] {name:16} {ms:8.1f} ms  (+{ms - previous:.1f})")
+
+
+def elapsed(name):
+    """Мс от старта до этапа или None"""
+    for existing, ms in marks:
+        if existing == name:
+            return ms
+    return None
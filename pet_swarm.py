@@ -0,0 +1,201 @@
+import numpy as np
+from pet import DesktopPet
+
+# Анимации, которыми управляет симуляция
+ANIMATIONS = ('idle', 'run')
+IDLE, RUN = 0, 1
+WANDER_CHANCE = 0.60
+
+
+class SwarmSimulation:
+    """Пакетная симуляция питомцев: состояние в массивах NumPy (struct of arrays).
+
+    Все питомцы продвигаются за один векторный шаг step(). Строки хранятся в
+    порядке добавления, а случайные числа для решений о блуждании берутся у
+    rng каждого питомца в том же порядке, что и в скалярном DesktopPet.update,
+    поэтому при одинаковом seed результаты совпадают.
+    """
+
+    FLOAT_FIELDS = ('x', 'y', 'prev_x', 'prev_y', 'draw_x', 'draw_y', 'target_x', 'target_y', 'speed',
+                    'anim_speed_ms')
+    INT_FIELDS = ('frame', 'anim', 'last_update', 'last_wander', 'last_social', 'wander_interval', 'screen_w',
+                  'screen_h')
+    BOOL_FIELDS = ('has_target', 'facing_right')
+
+    def __init__(self, capacity=64):
+        self.count = 0
+        self.capacity = 0
+        self.pets = []  # строка -> питомец
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        old_count = self.count
+        for names, dtype in ((self.FLOAT_FIELDS, np.float64), (self.INT_FIELDS, np.int64),
+                             (self.BOOL_FIELDS, np.bool_)):
+            for name in names:
+                array = np.zeros(capacity, dtype=dtype)
+                if self.capacity:
+                    array[:old_count] = getattr(self, name)[:old_count]
+                setattr(self, name, array)
+        frame_counts = np.ones((capacity, len(ANIMATIONS)), dtype=np.int64)
+        if self.capacity:
+            frame_counts[:old_count] = self.frame_counts[:old_count]
+        self.frame_counts = frame_counts
+        self.capacity = capacity
+
+    def add(self, pet):
+        """Переносит состояние питомца в строку массивов и делает его видом на эту строку"""
+        if self.count == self.capacity:
+            self._allocate(self.capacity * 2)
+        row = self.count
+        self.count += 1
+        self.pets.append(pet)
+
+        state = pet.__dict__
+        self.x[row] = state.pop('x_pos')
+        self.y[row] = state.pop('y_pos')
+        self.prev_x[row] = state.pop('prev_x')
+        self.prev_y[row] = state.pop('prev_y')
+        self.draw_x[row] = state.pop('draw_x')
+        self.draw_y[row] = state.pop('draw_y')
+        target = state.pop('wander_target')
+        self.has_target[row] = target is not None
+        self.target_x[row], self.target_y[row] = target if target is not None else (0, 0)
+        self.speed[row] = state.pop('wander_speed')
+        self.facing_right[row] = state.pop('facing_right')
+        self.frame[row] = state.pop('current_frame')
+        self.anim[row] = ANIMATIONS.index(state.pop('current_animation'))
+        self.last_update[row] = state.pop('last_update')
+        self.last_wander[row] = state.pop('last_wander_time')
+        self.last_social[row] = state.pop('last_social_time')
+        self.anim_speed_ms[row] = pet.animation_speed * 1000
+        self.wander_interval[row] = pet.wander_interval
+        self.screen_w[row] = pet.screen_width
+        self.screen_h[row] = pet.screen_height
+        for index, name in enumerate(ANIMATIONS):
+            self.frame_counts[row, index] = pet.get_frame_count(name)
+
+        pet._swarm = self
+        pet._row = row
+        pet.__class__ = SwarmPet
+
+    def remove(self, pet):
+        """Убирает строку питомца, сохраняя порядок остальных строк"""
+        row = pet._row
+        snapshot = {name: getattr(pet, name) for name in SwarmPet.FIELDS}
+        last = self.count - 1
+        for name in self.FLOAT_FIELDS + self.INT_FIELDS + self.BOOL_FIELDS + ('frame_counts',):
+            array = getattr(self, name)
+            array[row:last] = array[row + 1:last + 1]
+        del self.pets[row]
+        self.count = last
+        for moved_row in range(row, last):
+            self.pets[moved_row]._row = moved_row
+
+        pet.__class__ = DesktopPet
+        del pet._swarm, pet._row
+        pet.__dict__.update(snapshot)
+
+    def step(self, current_time):
+        """Один шаг симуляции всех питомцев (аналог DesktopPet.update для каждого)"""
+        n = self.count
+        if not n:
+            return
+        x, y = self.x[:n], self.y[:n]
+        target_x, target_y = self.target_x[:n], self.target_y[:n]
+        has_target, speed = self.has_target[:n], self.speed[:n]
+        anim, frame = self.anim[:n], self.frame[:n]
+        self.prev_x[:n] = x
+        self.prev_y[:n] = y
+
+        # Перемещение
+        dx = target_x - x
+        dy = target_y - y
+        distance = np.sqrt(dx * dx + dy * dy)
+        arrived = has_target & (distance < speed)
+        moving = has_target & ~arrived
+
+        x[arrived] = target_x[arrived]
+        y[arrived] = target_y[arrived]
+        has_target[arrived] = False
+        anim[arrived] = IDLE
+        frame[arrived] = 0
+
+        x[moving] += (dx[moving] / distance[moving]) * speed[moving]
+        y[moving] += (dy[moving] / distance[moving]) * speed[moving]
+        self.facing_right[:n][moving] = dx[moving] > 0
+
+        # Решения о блуждании (редко) - по порядку строк, как в скалярном цикле
+        due = (current_time - self.last_wander[:n] >= self.wander_interval[:n]) & (anim != RUN)
+        for row in np.flatnonzero(due):
+            self.last_wander[row] = current_time
+            rng = self.pets[row].rng
+            if rng.random() < WANDER_CHANCE:
+                self.target_x[row] = rng.randint(0, self.screen_w[row] - 100)
+                self.target_y[row] = rng.randint(0, self.screen_h[row] - 100)
+                has_target[row] = True
+                frame[row] = 0
+                anim[row] = RUN
+
+        # Анимация
+        advance = current_time - self.last_update[:n] > self.anim_speed_ms[:n]
+        counts = self.frame_counts[:n][np.arange(n), anim]
+        frame[advance] = (frame[advance] + 1) % counts[advance]
+        self.last_update[:n][advance] = current_time
+
+    def interpolate(self, alpha):
+        """Позиции отрисовки всех питомцев (аналог DesktopPet.interpolate)"""
+        n = self.count
+        prev_x, prev_y = self.prev_x[:n], self.prev_y[:n]
+        self.draw_x[:n] = prev_x + (self.x[:n] - prev_x) * alpha
+        self.draw_y[:n] = prev_y + (self.y[:n] - prev_y) * alpha
+
+
+def _field(array_name, getter=None, setter=None):
+    def fget(pet):
+        value = getattr(pet._swarm, array_name)[pet._row]
+        return getter(value) if getter else value.item()
+
+    def fset(pet, value):
+        getattr(pet._swarm, array_name)[pet._row] = setter(value) if setter else value
+
+    return property(fget, fset)
+
+
+def _get_target(pet):
+    swarm, row = pet._swarm, pet._row
+    if not swarm.has_target[row]:
+        return None
+    return (swarm.target_x[row].item(), swarm.target_y[row].item())
+
+
+def _set_target(pet, target):
+    swarm, row = pet._swarm, pet._row
+    swarm.has_target[row] = target is not None
+    if target is not None:
+        swarm.target_x[row], swarm.target_y[row] = target
+
+
+class SwarmPet(DesktopPet):
+    """DesktopPet, чье состояние - строка массивов SwarmSimulation"""
+
+    FIELDS = ('x_pos', 'y_pos', 'prev_x', 'prev_y', 'draw_x', 'draw_y', 'wander_target', 'wander_speed', 'facing_right', 'current_frame',
+              'current_animation', 'last_update', 'last_wander_time', 'last_social_time')
+
+    x_pos = _field('x')
+    y_pos = _field('y')
+    prev_x = _field('prev_x')
+    prev_y = _field('prev_y')
+    draw_x = _field('draw_x')
+    draw_y = _field('draw_y')
+    wander_target = property(_get_target, _set_target)
+    wander_speed = _field('speed')
+    facing_right = _field('facing_right')
+    current_frame = _field('frame')
+    current_animation = _field('anim', getter=lambda value: ANIMATIONS[value], setter=ANIMATIONS.index)
+    last_update = _field('last_update')
+    last_wander_time = _field('last_wander')
+    last_social_time = _field('last_social')
+
+    def update(self, current_time=None):
+        """Состояние обновляет SwarmSimulation.step для всех питомцев сразу"""
@@ -0,0 +1,157 @@
+"""Трассировка в формате Chrome trace events (chrome://tracing, Perfetto).
+
+    PET_TRACE=1 python pet.py              # Cache/trace-<время>.json
+    PET_TRACE=trace.json python pet.py
+
+    with pet_trace.span('events', 'loop'):
+        ...
+
+    @pet_trace.traced('update')
+    def update(self): ...
+
+Выключенная трассировка - одна проверка флага: span() возвращает общий
+пустой контекст, а обертка traced() сразу вызывает функцию.
+"""
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+
+# Сколько событий держать в памяти; дальше события не записываются
+MAX_EVENTS = 2_000_000
+TRACE_DIR = "Cache"
+
+enabled = False
+path = None
+dropped = 0
+_events = []   # (имя, категория, начало нс, конец нс, id потока, аргументы)
+_threads = {}  # id потока -> имя
+_origin = time.perf_counter_ns()
+_atexit_registered = False
+
+
+def _record(name, cat, start, end, args):
+    global dropped
+    if len(_events) >= MAX_EVENTS:
+        dropped += 1
+        return
+    tid = threading.get_ident()
+    if tid not in _threads:
+        _threads[tid] = threading.current_thread().name
+    _events.append((name, cat, start, end, tid, args))
+
+
+class _Span:
+    __slots__ = ('name', 'cat', 'args', 'start')
+
+    def __init__(self, name, cat, args):
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _record(self.name, self.cat, self.start, time.perf_counter_ns(), self.args)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name, cat='pet', args=None):
+    """Контекстный менеджер: отрезок времени name в трассе"""
+    if not enabled:
+        return _NULL_SPAN
+    return _Span(name, cat, args)
+
+
+def traced(name=None, cat='pet'):
+    """Декоратор: каждый вызов функции - отрезок в трассе"""
+    def decorate(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _record(label, cat, start, time.perf_counter_ns(), None)
+
+        return wrapper
+    return decorate
+
+
+def start(trace_path=None):
+    """Начинает запись; trace_path по умолчанию - Cache/trace-<время>.json"""
+    global enabled, path, dropped, _atexit_registered
+    if enabled:
+        return path
+    path = trace_path or os.path.join(TRACE_DIR, time.strftime("trace-%Y%m%d-%H%M%S.json"))
+    dropped = 0
+    _events.clear()
+    enabled = True
+    if not _atexit_registered:
+        atexit.register(stop)
+        _atexit_registered = True
+    return path
+
+
+def stop():
+    """Останавливает запись и сохраняет трассу; возвращает путь файла или None"""
+    global enabled, _events
+    if not enabled:
+        return None
+    enabled = False
+    events, _events = _events, []
+
+    pid = os.getpid()
+    trace = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+             for tid, name in _threads.items()]
+    for name, cat, begin, end, tid, args in events:
+        event = {"name": name, "cat": cat, "ph": "X", "pid": pid, "tid": tid,
+                 "ts": (begin - _origin) / 1000, "dur": (end - begin) / 1000}
+        if args:
+            event["args"] = args
+        trace.append(event)
+    try:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+    except OSError as e:
+        print(f"Ошибка записи трассы: {e}")
+        return None
+    message = f"Трасса сохранена: {path}, событий {len(events)}"
+    if dropped:
+        message += f", пропущено {dropped}"
+    print(message)
+    return path
+
+
+def toggle():
+    """Включает или выключает запись (для меню трея)"""
+    if enabled:
+        return stop()
+    return start()
+
+
+def event_count():
+    return len(_events)